@@ -0,0 +1,30 @@
+"""add updated_at
+
+Revision ID: 3a7c5e0f9d14
+Revises: f0a6d3b95c18
+Create Date: 2024-11-28 14:37:09.782615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7c5e0f9d14'
+down_revision = 'f0a6d3b95c18'
+branch_labels = None
+depends_on = None
+
+TABLES = ['restaurant', 'operatingdatetime', 'item', 'book']
+
+
+def upgrade():
+    # existing rows count as modified now
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False))
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,38 @@
+"""add restaurant search vector
+
+Revision ID: 4b7e2c91d0a5
+Revises: 29e6d6188e03
+Create Date: 2024-11-20 21:12:40.318224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2c91d0a5'
+down_revision = '29e6d6188e03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('restaurant', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('portuguese'::regconfig, coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('portuguese'::regconfig, coalesce(description, '')), 'B') || "
+            "setweight(to_tsvector('portuguese'::regconfig, coalesce(address, '')), 'C')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_restaurant_search_vector', 'restaurant', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_restaurant_search_vector', table_name='restaurant', postgresql_using='gin')
+    op.drop_column('restaurant', 'search_vector')
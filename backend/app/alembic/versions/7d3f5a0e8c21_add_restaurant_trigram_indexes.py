@@ -0,0 +1,39 @@
+"""add restaurant trigram indexes
+
+Revision ID: 7d3f5a0e8c21
+Revises: 4b7e2c91d0a5
+Create Date: 2024-11-21 19:47:03.552917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3f5a0e8c21'
+down_revision = '4b7e2c91d0a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # unaccent() is only STABLE (it depends on the dictionary search path), an
+    # immutable wrapper pinned to the schema is needed to use it in an index
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+        """
+    )
+    op.execute("CREATE INDEX ix_restaurant_name_trgm ON restaurant USING gin (f_unaccent(lower(name)) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_restaurant_address_trgm ON restaurant USING gin (f_unaccent(lower(address)) gin_trgm_ops)")
+
+
+def downgrade():
+    op.drop_index('ix_restaurant_address_trgm', table_name='restaurant')
+    op.drop_index('ix_restaurant_name_trgm', table_name='restaurant')
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
@@ -0,0 +1,53 @@
+"""add operating time week minutes
+
+Revision ID: a91c4e6b2f37
+Revises: 7d3f5a0e8c21
+Create Date: 2024-11-23 16:05:12.904431
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c4e6b2f37'
+down_revision = '7d3f5a0e8c21'
+branch_labels = None
+depends_on = None
+
+WEEK_DAY = (
+    "(CASE lower(day_of_week::text) WHEN 'monday' THEN 0 WHEN 'tuesday' THEN 1 "
+    "WHEN 'wednesday' THEN 2 WHEN 'thursday' THEN 3 WHEN 'friday' THEN 4 "
+    "WHEN 'saturday' THEN 5 WHEN 'sunday' THEN 6 END)"
+)
+OPEN_MINUTES = "(split_part(open_time::text, ':', 1)::int * 60 + split_part(open_time::text, ':', 2)::int)"
+CLOSE_MINUTES = "(split_part(close_time::text, ':', 1)::int * 60 + split_part(close_time::text, ':', 2)::int)"
+
+
+def upgrade():
+    op.add_column('operatingdatetime', sa.Column(
+        'open_minute',
+        sa.Integer(),
+        sa.Computed(f"{WEEK_DAY} * 1440 + {OPEN_MINUTES}", persisted=True),
+        nullable=True,
+    ))
+    op.add_column('operatingdatetime', sa.Column(
+        'close_minute',
+        sa.Integer(),
+        sa.Computed(
+            f"{WEEK_DAY} * 1440 + {CLOSE_MINUTES} + "
+            f"(CASE WHEN {CLOSE_MINUTES} <= {OPEN_MINUTES} THEN 1440 ELSE 0 END)",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_operatingdatetime_restaurant_id_day_of_week', 'operatingdatetime', ['restaurant_id', 'day_of_week'], unique=False)
+    op.create_index('ix_operatingdatetime_week_range', 'operatingdatetime', [sa.text('int4range(open_minute, close_minute)')], unique=False, postgresql_using='gist')
+
+
+def downgrade():
+    op.drop_index('ix_operatingdatetime_week_range', table_name='operatingdatetime', postgresql_using='gist')
+    op.drop_index('ix_operatingdatetime_restaurant_id_day_of_week', table_name='operatingdatetime')
+    op.drop_column('operatingdatetime', 'close_minute')
+    op.drop_column('operatingdatetime', 'open_minute')
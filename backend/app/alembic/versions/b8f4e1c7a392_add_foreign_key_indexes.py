@@ -0,0 +1,42 @@
+"""add foreign key indexes
+
+Revision ID: b8f4e1c7a392
+Revises: e53b0f7d2a64
+Create Date: 2024-11-26 10:12:44.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f4e1c7a392'
+down_revision = 'e53b0f7d2a64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the per-user lists, in the order they're paginated (app/api/routes)
+    op.create_index('ix_item_owner_id_title', 'item', ['owner_id', 'title', 'id'], unique=False)
+    op.create_index('ix_book_owner_id_created_at', 'book', ['owner_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_payment_owner_id_created_at', 'payment', ['owner_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_restaurant_name_id', 'restaurant', ['name', 'id'], unique=False)
+    # the rest of the foreign keys, for the lookups by restaurant and the
+    # ON DELETE CASCADE from user and restaurant (payment.book_id is covered by
+    # ix_payment_book_id_status, operatingdatetime.restaurant_id by
+    # ix_operatingdatetime_restaurant_id_day_of_week)
+    op.create_index('ix_item_restaurant_id', 'item', ['restaurant_id'], unique=False)
+    op.create_index('ix_book_restaurant_id_created_at', 'book', ['restaurant_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_restaurant_owner_id', 'restaurant', ['owner_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_restaurant_owner_id', table_name='restaurant')
+    op.drop_index('ix_book_restaurant_id_created_at', table_name='book')
+    op.drop_index('ix_item_restaurant_id', table_name='item')
+    op.drop_index('ix_restaurant_name_id', table_name='restaurant')
+    op.drop_index('ix_payment_owner_id_created_at', table_name='payment')
+    op.drop_index('ix_book_owner_id_created_at', table_name='book')
+    op.drop_index('ix_item_owner_id_title', table_name='item')
@@ -0,0 +1,32 @@
+"""activate books with paid payments
+
+Revision ID: c2e8d47a19b6
+Revises: a91c4e6b2f37
+Create Date: 2024-11-24 14:31:58.120377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e8d47a19b6'
+down_revision = 'a91c4e6b2f37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # books used to be activated lazily when reading them, now it happens when
+    # the payment is settled, catch up the ones paid but never read since
+    op.execute(
+        """
+        UPDATE book SET active = true
+        WHERE NOT active AND id IN (SELECT book_id FROM payment WHERE status = 'paid')
+        """
+    )
+
+
+def downgrade():
+    pass
@@ -0,0 +1,39 @@
+"""add idempotency keys
+
+Revision ID: e53b0f7d2a64
+Revises: c2e8d47a19b6
+Create Date: 2024-11-22 15:41:08.203917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e53b0f7d2a64'
+down_revision = 'c2e8d47a19b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotencykey',
+    sa.Column('owner_id', sa.Uuid(), nullable=False),
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('request_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('response', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id', 'key')
+    )
+    op.create_index(op.f('ix_idempotencykey_expires_at'), 'idempotencykey', ['expires_at'], unique=False)
+    # finds the active charge of a book to reuse it
+    op.create_index('ix_payment_book_id_status', 'payment', ['book_id', 'status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_payment_book_id_status', table_name='payment')
+    op.drop_index(op.f('ix_idempotencykey_expires_at'), table_name='idempotencykey')
+    op.drop_table('idempotencykey')
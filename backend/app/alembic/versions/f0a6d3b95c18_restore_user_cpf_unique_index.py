@@ -0,0 +1,26 @@
+"""restore user cpf unique index
+
+Revision ID: f0a6d3b95c18
+Revises: b8f4e1c7a392
+Create Date: 2024-11-27 09:03:51.640127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0a6d3b95c18'
+down_revision = 'b8f4e1c7a392'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # dropped by 215fe09bf6aa, signups rely on it to reject a taken CPF
+    op.create_index(op.f('ix_user_cpf'), 'user', ['cpf'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_user_cpf'), table_name='user')
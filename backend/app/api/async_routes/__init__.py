@@ -0,0 +1,8 @@
+"""
+Async versions of the busiest route modules, on the async engine.
+
+Selected with the ASYNC_DB setting, see app/api/main.py. The handlers run on
+the event loop instead of the worker's thread pool, so a worker can wait on
+many more slow clients and queries at once. Helpers written against a sync
+`Session` (pagination, search, crud) are reused through `run_sync`.
+"""
@@ -0,0 +1,78 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter
+
+from app.api.deps import AsyncCurrentUser, AsyncSessionDep
+from app.api.pagination import PaginationDep
+from app.api.routes import books as sync_books
+from app.models import BookCreate, BookPublic, BooksPublic, BookUpdate, Message
+
+router = APIRouter()
+
+
+@router.get("/", response_model=BooksPublic)
+async def read_books(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, pagination: PaginationDep
+) -> Any:
+    """
+    Retrieve books.
+    """
+    return await session.run_sync(sync_books.books_page, current_user, pagination)
+
+
+@router.get("/{id}", response_model=BookPublic)
+async def read_book(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, id: uuid.UUID
+) -> Any:
+    """
+    Get book by ID.
+    """
+    return await session.run_sync(sync_books.user_book, current_user, id)
+
+
+@router.post("/", response_model=BookPublic)
+async def create_book(
+    *, session: AsyncSessionDep, current_user: AsyncCurrentUser, book_in: BookCreate
+) -> Any:
+    """
+    Create new book.
+    """
+    book = await session.run_sync(sync_books.new_book, current_user, book_in)
+    session.add(book)
+    await session.commit()
+    await session.refresh(book)
+    return book
+
+
+@router.put("/{id}", response_model=BookPublic)
+async def update_book(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    id: uuid.UUID,
+    book_in: BookUpdate,
+) -> Any:
+    """
+    Update an book.
+    """
+    book = await session.run_sync(sync_books.book_to_update, current_user, id, book_in)
+    update_dict = book_in.model_dump(exclude_unset=True)
+    book.sqlmodel_update(update_dict)
+    session.add(book)
+    await session.commit()
+    await session.refresh(book)
+    return book
+
+
+@router.delete("/{id}")
+async def delete_book(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, id: uuid.UUID
+) -> Message:
+    """
+    Delete an book.
+    """
+    book = await session.run_sync(sync_books.user_book, current_user, id)
+    await session.delete(book)
+    await session.commit()
+    return Message(message="Book deleted successfully")
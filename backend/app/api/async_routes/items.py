@@ -0,0 +1,80 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, Request, Response
+
+from app.api.deps import AsyncCurrentUser, AsyncReadSessionDep, AsyncSessionDep
+from app.api.pagination import PaginationDep
+from app.api.routes import items as sync_items
+from app.models import ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+
+router = APIRouter()
+
+
+@router.get("/", response_model=ItemsPublic)
+async def read_items(
+    request: Request,
+    response: Response,
+    session: AsyncReadSessionDep,
+    current_user: AsyncCurrentUser,
+    pagination: PaginationDep,
+) -> Any:
+    """
+    Retrieve items.
+    """
+    return await session.run_sync(
+        sync_items.items_page, request, response, current_user, pagination
+    )
+
+
+@router.get("/{id}", response_model=ItemPublic)
+async def read_item(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, id: uuid.UUID
+) -> Any:
+    """
+    Get item by ID.
+    """
+    return await session.run_sync(sync_items.user_item, current_user, id)
+
+
+@router.post("/", response_model=ItemPublic)
+async def create_item(
+    *, session: AsyncSessionDep, current_user: AsyncCurrentUser, item_in: ItemCreate
+) -> Any:
+    """
+    Create new item.
+    """
+    return await session.run_sync(sync_items.add_item, current_user, item_in)
+
+
+@router.put("/{id}", response_model=ItemPublic)
+async def update_item(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    id: uuid.UUID,
+    item_in: ItemUpdate,
+) -> Any:
+    """
+    Update an item.
+    """
+    item = await session.run_sync(sync_items.item_to_update, current_user, id, item_in)
+    update_dict = item_in.model_dump(exclude_unset=True)
+    item.sqlmodel_update(update_dict)
+    session.add(item)
+    await session.commit()
+    await session.refresh(item)
+    return item
+
+
+@router.delete("/{id}")
+async def delete_item(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, id: uuid.UUID
+) -> Message:
+    """
+    Delete an item.
+    """
+    item = await session.run_sync(sync_items.user_item, current_user, id)
+    await session.delete(item)
+    await session.commit()
+    return Message(message="Item deleted successfully")
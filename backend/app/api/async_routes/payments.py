@@ -0,0 +1,257 @@
+import hashlib
+import uuid
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.api.deps import AsyncCurrentUser, AsyncSessionDep
+from app.api.pagination import PaginationDep
+from app.api.routes import payments as sync_payments
+from app.core.config import settings
+from app.models import (
+    Charge,
+    IdempotencyKey,
+    Message,
+    Payment,
+    PaymentCharge,
+    PaymentCreate,
+    PaymentPublic,
+    PaymentsPublic,
+    PaymentUpdate,
+    PixWebhook,
+)
+from app.payment import (
+    PixError,
+    acreate_immediate_charge,
+    adetail_charge,
+    apaid_charges,
+    charge_status,
+)
+from app.principal import UserPrincipal
+
+router = APIRouter()
+
+
+@router.get("/", response_model=PaymentsPublic)
+async def read_payments(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, pagination: PaginationDep
+) -> Any:
+    """
+    Retrieve payments.
+    """
+    return await session.run_sync(sync_payments.payments_page, current_user, pagination)
+
+
+async def _detail_charge(txid: str) -> dict[str, Any] | None:
+    try:
+        return await adetail_charge(txid)
+    except PixError:
+        raise HTTPException(status_code=503, detail="Payment provider unavailable")
+
+
+@router.get("/{id}", response_model=PaymentCharge)
+async def read_payment(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, id: uuid.UUID
+) -> Any:
+    """
+    Get payment by ID.
+
+    Only reads the database, the status is kept up to date by the PSP webhook
+    and the reconciler (`python -m app.reconcile`, its own service in
+    docker-compose.yml). The charge comes with the response that created it.
+    """
+    payment = await session.run_sync(sync_payments.user_payment, current_user, id)
+    return PaymentCharge.model_validate(payment, update={"charge": None})
+
+
+async def _active_charge(
+    session: AsyncSessionDep, current_user: UserPrincipal, book_id: uuid.UUID
+) -> PaymentCharge | None:
+    """
+    The pending payment of the book whose charge can still be paid, if any.
+    """
+    payment = await session.run_sync(
+        sync_payments.pending_payment, current_user, book_id
+    )
+    if not payment or not payment.token:
+        return None
+    charge_data = await _detail_charge(payment.token)
+    if not charge_data:
+        return None
+    charge = Charge(**charge_data)
+    if charge_status(charge) != "pending":
+        return None
+    return PaymentCharge.model_validate(payment, update={"charge": charge})
+
+
+async def _create_payment(
+    session: AsyncSessionDep, current_user: UserPrincipal, payment_in: PaymentCreate
+) -> PaymentCharge:
+    restaurant = await session.run_sync(
+        sync_payments.payable_restaurant, current_user, payment_in
+    )
+
+    # paying the same book again gets the charge that is still open
+    active = await _active_charge(session, current_user, payment_in.book_id)
+    if active:
+        return active
+
+    payment = Payment.model_validate(
+        payment_in, update={"owner_id": current_user.id, "value": restaurant.book_price}
+    )
+    try:
+        charge_data = await acreate_immediate_charge(
+            expiration=30,
+            cpf=str(current_user.cpf),
+            name=str(current_user.full_name),
+            value=int(restaurant.book_price),
+            key=str(settings.EFIPAY_EVP_KEY),
+            description=f"booking in {restaurant.name}",
+        )
+    except PixError:
+        raise HTTPException(status_code=503, detail="Payment provider unavailable")
+    if not charge_data:
+        raise HTTPException(status_code=500, detail="Create payment failed")
+    try:
+        charge = Charge(**charge_data)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Create payment failed")
+    payment.token = charge.txid
+    session.add(payment)
+    await session.commit()
+    await session.refresh(payment)
+    return PaymentCharge.model_validate(payment, update={"charge": charge})
+
+
+@router.post("/", response_model=PaymentCharge)
+async def create_payment(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    payment_in: PaymentCreate,
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+) -> Any:
+    """
+    Create new payment.
+
+    Retries sent with the same `Idempotency-Key` header get the response of
+    the first request instead of creating another charge.
+    """
+    if not idempotency_key:
+        return await _create_payment(session, current_user, payment_in)
+
+    request_hash = hashlib.sha256(payment_in.model_dump_json().encode()).hexdigest()
+    key = idempotency_key
+
+    def claim(sync_session: Session) -> IdempotencyKey | None:
+        return crud.claim_idempotency_key(
+            session=sync_session,
+            owner_id=current_user.id,
+            key=key,
+            request_hash=request_hash,
+            ttl=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+        )
+
+    def release(sync_session: Session) -> None:
+        crud.release_idempotency_key(
+            session=sync_session, owner_id=current_user.id, key=key
+        )
+
+    def save(sync_session: Session, response: PaymentCharge) -> None:
+        crud.save_idempotent_response(
+            session=sync_session,
+            owner_id=current_user.id,
+            key=key,
+            response=response.model_dump(mode="json"),
+        )
+
+    previous = await session.run_sync(claim)
+    if previous is not None:
+        if previous.request_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key already used for a different request",
+            )
+        if previous.response is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is in progress",
+            )
+        return PaymentCharge.model_validate(previous.response)
+
+    try:
+        response = await _create_payment(session, current_user, payment_in)
+    except BaseException:
+        await session.rollback()
+        await session.run_sync(release)
+        raise
+    await session.run_sync(save, response)
+    return response
+
+
+# the PSP posts to the registered URL with /pix appended
+@router.post("/webhook")
+@router.post("/webhook/pix")
+async def pix_webhook(
+    session: AsyncSessionDep, notification: PixWebhook, hmac: str | None = None
+) -> Message:
+    """
+    Receive PIX payment notifications from the PSP.
+
+    A batch settles all its payments at once and redelivered notifications
+    are ignored, so the PSP can retry freely. Only the charges the PSP
+    confirms as paid when asked again are settled.
+    """
+    charges = sync_payments.received_charges(notification, hmac)
+    try:
+        confirmed = await apaid_charges(list(charges))
+    except PixError:
+        raise HTTPException(status_code=503, detail="Payment provider unavailable")
+
+    def pay(sync_session: Session) -> list[uuid.UUID]:
+        return crud.pay_charges(
+            session=sync_session, charges={txid: charges[txid] for txid in confirmed}
+        )
+
+    paid = await session.run_sync(pay)
+    return Message(message=f"{len(paid)} payments settled")
+
+
+@router.put("/{id}", response_model=PaymentPublic)
+async def update_payment(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    id: uuid.UUID,
+    payment_in: PaymentUpdate,
+) -> Any:
+    """
+    Update an payment.
+    """
+    payment = await session.run_sync(
+        sync_payments.payment_to_update, current_user, id, payment_in
+    )
+
+    def update(sync_session: Session) -> bool:
+        return crud.update_payment(
+            session=sync_session, payment=payment, payment_in=payment_in
+        )
+
+    if not await session.run_sync(update):
+        raise HTTPException(status_code=400, detail="Invalid payment status change")
+    return payment
+
+
+@router.delete("/{id}")
+async def delete_payment(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, id: uuid.UUID
+) -> Message:
+    """
+    Delete an payment.
+    """
+    payment = await session.run_sync(sync_payments.user_payment, current_user, id)
+    await session.delete(payment)
+    await session.commit()
+    return Message(message="Payment deleted successfully")
@@ -0,0 +1,285 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app import search
+from app.api import conditional
+from app.api.deps import AsyncCurrentUser, AsyncReadSessionDep, AsyncSessionDep
+from app.api.pagination import PaginationDep
+from app.api.responses import json_response
+from app.api.routes import restaurants as sync_restaurants
+from app.api.routes.restaurants import EmbeddedLimit
+from app.models import (
+    BooksPublic,
+    ItemsPublic,
+    Message,
+    OperatingDateTime,
+    OperatingDateTimeBase,
+    OperatingDateTimeCreate,
+    OperatingDateTimeUpdate,
+    Restaurant,
+    RestaurantCreate,
+    RestaurantFull,
+    RestaurantPublic,
+    RestaurantsPublic,
+    RestaurantUpdate,
+    WeekEnum,
+)
+
+router = APIRouter()
+
+
+# before /{id}, like in the sync module
+@router.get("/search", response_model=RestaurantsPublic)
+async def search_restaurants(
+    *,
+    session: AsyncReadSessionDep,
+    pagination: PaginationDep,
+    query: str,
+    mode: search.SearchMode = search.SearchMode.fulltext,
+) -> Any:
+    """
+    Search for restaurants based on a query string.
+
+    `fulltext` matches whole words (or their beginning), `fuzzy` tolerates
+    typos and accents, e.g. "pizaria" finds "Pizzaria".
+    """
+    return await session.run_sync(sync_restaurants.search_page, pagination, query, mode)
+
+
+@router.get("/", response_model=RestaurantsPublic)
+async def read_restaurants(
+    request: Request,
+    response: Response,
+    session: AsyncReadSessionDep,
+    pagination: PaginationDep,
+    only_open: bool = True,
+) -> Any:
+    """
+    Retrieve restaurants.
+    """
+    return await session.run_sync(
+        sync_restaurants.restaurants_page, request, response, pagination, only_open
+    )
+
+
+@router.get("/{id}", response_model=RestaurantFull)
+async def read_restaurant(
+    request: Request,
+    response: Response,
+    session: AsyncReadSessionDep,
+    id: uuid.UUID,
+    items_limit: EmbeddedLimit = 20,
+    books_limit: EmbeddedLimit = 20,
+) -> Any:
+    """
+    Get restaurant by ID, with its first `items_limit` items and latest
+    `books_limit` books.
+    """
+    found = await session.run_sync(
+        sync_restaurants.restaurant_full, id, items_limit, books_limit
+    )
+    if not found:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    restaurant, version = found
+    # the books name who booked them, not for shared caches
+    if not_modified := conditional.check(request, response, version, public=False):
+        return not_modified
+    return json_response(RestaurantFull, restaurant, response)
+
+
+@router.get("/{id}/items", response_model=ItemsPublic)
+async def read_restaurant_items(
+    request: Request,
+    response: Response,
+    session: AsyncReadSessionDep,
+    id: uuid.UUID,
+    pagination: PaginationDep,
+) -> Any:
+    """
+    Retrieve the items of a restaurant.
+    """
+    return await session.run_sync(
+        sync_restaurants.restaurant_items_page, request, response, id, pagination
+    )
+
+
+@router.get("/{id}/books", response_model=BooksPublic)
+async def read_restaurant_books(
+    request: Request,
+    response: Response,
+    session: AsyncReadSessionDep,
+    id: uuid.UUID,
+    pagination: PaginationDep,
+) -> Any:
+    """
+    Retrieve the books of a restaurant, latest first.
+    """
+    return await session.run_sync(
+        sync_restaurants.restaurant_books_page, request, response, id, pagination
+    )
+
+
+@router.post("/", response_model=RestaurantPublic)
+async def create_restaurant(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    restaurant_in: RestaurantCreate,
+) -> Any:
+    """
+    Create new restaurant.
+    """
+    restaurant = Restaurant.model_validate(
+        restaurant_in, update={"owner_id": current_user.id}
+    )
+    session.add(restaurant)
+    await session.commit()
+    await session.refresh(restaurant)
+    return restaurant
+
+
+@router.put("/{id}", response_model=RestaurantPublic)
+async def update_restaurant(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    id: uuid.UUID,
+    restaurant_in: RestaurantUpdate,
+) -> Any:
+    """
+    Update a restaurant.
+    """
+    restaurant = await session.run_sync(
+        sync_restaurants.owned_restaurant, current_user, id
+    )
+    update_dict = restaurant_in.model_dump(exclude_unset=True)
+    restaurant.sqlmodel_update(update_dict)
+    session.add(restaurant)
+    await session.commit()
+    await session.refresh(restaurant)
+    return restaurant
+
+
+@router.delete("/{id}")
+async def delete_restaurant(
+    session: AsyncSessionDep, current_user: AsyncCurrentUser, id: uuid.UUID
+) -> Message:
+    """
+    Delete a restaurant.
+    """
+    restaurant = await session.run_sync(
+        sync_restaurants.owned_restaurant, current_user, id
+    )
+    await session.delete(restaurant)
+    await session.commit()
+    return Message(message="Restaurant deleted successfully")
+
+
+@router.get(
+    "/{restaurant_id}/operating_date_times/",
+    response_model=list[OperatingDateTimeBase],
+)
+async def get_operating_date_times(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    restaurant_id: uuid.UUID,
+) -> Any:
+    """
+    Get all operating date times for a restaurant.
+    """
+    await session.run_sync(
+        sync_restaurants.owned_restaurant, current_user, restaurant_id
+    )
+    return await session.run_sync(sync_restaurants.operating_times_of, restaurant_id)
+
+
+@router.post(
+    "/{restaurant_id}/operating_date_times/", response_model=OperatingDateTimeBase
+)
+async def create_operating_date_time(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    restaurant_id: uuid.UUID,
+    operating_time_in: OperatingDateTimeCreate,
+) -> Any:
+    """
+    Create a new operating date time for a restaurant.
+    """
+    await session.run_sync(
+        sync_restaurants.owned_restaurant, current_user, restaurant_id
+    )
+    if await session.run_sync(
+        sync_restaurants.operating_time_of,
+        restaurant_id,
+        operating_time_in.day_of_week,
+    ):
+        raise HTTPException(
+            status_code=400, detail="Operating date time for this day already exists"
+        )
+
+    operating_time = OperatingDateTime.model_validate(
+        operating_time_in, update={"restaurant_id": restaurant_id}
+    )
+    session.add(operating_time)
+    await session.commit()
+    await session.refresh(operating_time)
+    return operating_time
+
+
+@router.put(
+    "/{restaurant_id}/operating_date_times/", response_model=OperatingDateTimeBase
+)
+async def update_operating_date_time(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    restaurant_id: uuid.UUID,
+    operating_time_in: OperatingDateTimeUpdate,
+) -> Any:
+    """
+    Update an operating date time for a restaurant.
+    """
+    await session.run_sync(
+        sync_restaurants.owned_restaurant, current_user, restaurant_id
+    )
+    operating_time = await session.run_sync(
+        sync_restaurants.operating_time_of,
+        restaurant_id,
+        operating_time_in.day_of_week,
+    )
+    if not operating_time:
+        raise HTTPException(status_code=404, detail="Operating date time not found")
+    update_dict = operating_time_in.model_dump(exclude_unset=True)
+    operating_time.sqlmodel_update(update_dict)
+    session.add(operating_time)
+    await session.commit()
+    await session.refresh(operating_time)
+    return operating_time
+
+
+@router.delete("/{restaurant_id}/operating_date_times")
+async def delete_operating_date_time(
+    *,
+    session: AsyncSessionDep,
+    current_user: AsyncCurrentUser,
+    restaurant_id: uuid.UUID,
+    week_day: WeekEnum,
+) -> Message:
+    """
+    Delete an operating date time for a restaurant.
+    """
+    await session.run_sync(
+        sync_restaurants.owned_restaurant, current_user, restaurant_id
+    )
+    operating_time = await session.run_sync(
+        sync_restaurants.operating_time_of, restaurant_id, week_day
+    )
+    if not operating_time:
+        raise HTTPException(status_code=404, detail="Operating date time not found")
+    await session.delete(operating_time)
+    await session.commit()
+    return Message(message="Operating date time deleted successfully")
@@ -0,0 +1,71 @@
+"""
+Conditional GETs, so clients and shared caches can revalidate what they
+already have instead of downloading it again.
+
+The validators come from the rows a response is made of (their ids and
+`updated_at`) along with whatever else is in it, such as the count and the
+cursor to the next page. The rows are read as usual, a 304 saves
+serializing and sending them, and no other query is made for the
+validators: the count mode of a page stays the client's choice.
+
+There is no `Last-Modified`: every response here is a list or embeds one,
+and a deleted row leaves no `updated_at` behind to move its date, a client
+revalidating with `If-Modified-Since` would keep a stale copy. The ETag
+changes with the ids of the rows.
+"""
+
+import hashlib
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+@dataclass
+class Version:
+    etag: str
+
+
+def version(rows: Iterable[Any], *extra: Hashable) -> Version:
+    """
+    Version of a response made of the `rows`, models with an `updated_at`
+    column. `extra` goes into the ETag along with them.
+    """
+    state = [(row.id, row.updated_at) for row in rows]
+    digest = hashlib.sha256(repr((state, extra)).encode()).hexdigest()
+    return Version(etag=f'W/"{digest[:32]}"')
+
+
+def _not_modified(request: Request, version: Version) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or version.etag.removeprefix("W/") in tags
+
+
+def check(
+    request: Request, response: Response, version: Version, *, public: bool = True
+) -> Response | None:
+    """
+    A 304 response if the client's copy is still current, otherwise None after
+    setting the validators on the response about to be sent.
+
+    Public responses may be kept by shared caches for
+    HTTP_CACHE_MAX_AGE_SECONDS, private ones are revalidated on every use.
+    """
+    headers = {
+        "ETag": version.etag,
+        "Cache-Control": (
+            f"public, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}"
+            if public
+            else "private, no-cache"
+        ),
+    }
+    if _not_modified(request, version):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,4 +1,5 @@
-from collections.abc import Generator
+import uuid
+from collections.abc import AsyncGenerator, Generator
 from typing import Annotated
 
 import jwt
@@ -7,11 +8,14 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import async_engine, engine
+from app.core.replicas import replicas
 from app.models import TokenPayload, User
+from app.principal import UserPrincipal, principal_cache
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -23,33 +27,106 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # nothing can be lazy loaded from async code, so objects must stay usable
+    # after a commit
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    Session on a read replica, for handlers that only read shared data.
+    Anything a user may read right after writing it stays on `get_db`.
+    """
+    with replicas.session() as session:
+        yield session
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with await replicas.async_session() as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+AsyncReadSessionDep = Annotated[AsyncSession, Depends(get_async_read_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def _token_user_id(token: str) -> uuid.UUID:
+    user_id = security.token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = TokenPayload(**payload)
-    except (InvalidTokenError, ValidationError):
+        user_id = uuid.UUID(str(TokenPayload(**payload).sub))
+    except (InvalidTokenError, ValidationError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
-    if not user:
+    if "exp" in payload:
+        security.token_cache.put(token, user_id, float(payload["exp"]))
+    return user_id
+
+
+def _active_user(principal: UserPrincipal | None) -> UserPrincipal:
+    if not principal:
         raise HTTPException(status_code=404, detail="User not found")
-    if not user.is_active:
+    if not principal.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+def _load_principal(user: User | None) -> UserPrincipal | None:
+    if not user:
+        return None
+    principal = UserPrincipal.from_user(user)
+    principal_cache.put(principal)
+    return principal
+
+
+def get_current_user(session: SessionDep, token: TokenDep) -> UserPrincipal:
+    user_id = _token_user_id(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        # the session only connects on this miss
+        principal = _load_principal(session.get(User, user_id))
+    return _active_user(principal)
+
+
+async def get_current_user_async(
+    session: AsyncSessionDep, token: TokenDep
+) -> UserPrincipal:
+    user_id = _token_user_id(token)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        principal = _load_principal(await session.get(User, user_id))
+    return _active_user(principal)
+
+
+CurrentUser = Annotated[UserPrincipal, Depends(get_current_user)]
+AsyncCurrentUser = Annotated[UserPrincipal, Depends(get_current_user_async)]
+
+
+def get_current_db_user(session: SessionDep, current_user: CurrentUser) -> User:
+    """
+    The authenticated user's row, for the handlers that change or return it.
+    """
+    user = session.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentDBUser = Annotated[User, Depends(get_current_db_user)]
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+def get_current_active_superuser(current_user: CurrentUser) -> UserPrincipal:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
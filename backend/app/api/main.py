@@ -1,6 +1,19 @@
 from fastapi import APIRouter
 
+from app.api.async_routes import books as async_books
+from app.api.async_routes import items as async_items
+from app.api.async_routes import payments as async_payments
+from app.api.async_routes import restaurants as async_restaurants
 from app.api.routes import items, login, users, utils, restaurants, books, payments
+from app.core.config import settings
+
+if settings.ASYNC_DB:
+    items, restaurants, books, payments = (  # type: ignore[misc]
+        async_items,
+        async_restaurants,
+        async_books,
+        async_payments,
+    )
 
 api_router = APIRouter()
 api_router.include_router(login.router, tags=["login"])
@@ -0,0 +1,210 @@
+import base64
+import binascii
+import json
+import uuid
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from types import UnionType
+from typing import Annotated, Any
+
+from fastapi import Depends, HTTPException
+from sqlalchemy import ColumnElement, Select, Table, TypeDecorator, text, tuple_
+from sqlalchemy.orm import Mapped, QueryableAttribute, Session
+from sqlmodel import func, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.core.db import explain
+
+
+class CountMode(str, Enum):
+    exact = "exact"
+    # planner statistics, cheap but only approximate
+    estimate = "estimate"
+    # no total at all, rely on has_more/next_cursor
+    none = "none"
+
+
+@dataclass
+class Pagination:
+    skip: int
+    limit: int
+    count_mode: CountMode = CountMode.exact
+    # sort key of the last row of the previous page, uuid tiebreaker last
+    after: list[Any] | None = None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    tagged = []
+    for value in values:
+        if isinstance(value, datetime):
+            tagged.append(["d", value.isoformat()])
+        elif isinstance(value, uuid.UUID):
+            tagged.append(["u", str(value)])
+        else:
+            tagged.append(["v", value])
+    raw = json.dumps(tagged, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values: list[Any] = []
+        for tag, value in json.loads(raw):
+            match tag:
+                case "d":
+                    values.append(datetime.fromisoformat(value))
+                case "u":
+                    values.append(uuid.UUID(value))
+                case "v":
+                    values.append(value)
+                case _:
+                    raise ValueError(tag)
+        return values
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def get_pagination(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    count_mode: CountMode = CountMode.exact,
+) -> Pagination:
+    """
+    Offset or keyset pagination for list endpoints.
+
+    Every page comes with a `next_cursor`; passing it back as `cursor` fetches
+    the following page by seeking past the last row instead of skipping over
+    all the previous ones, so deep pages cost the same as the first. `skip` is
+    ignored when a cursor is given.
+
+    `count_mode` picks how the total is computed: `exact` runs a COUNT(*),
+    `estimate` reads the planner statistics and `none` skips it, leaving
+    `has_more` to tell whether there's a next page.
+    """
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Limit must be positive")
+    if cursor is None:
+        return Pagination(skip=skip, limit=limit, count_mode=count_mode)
+    return Pagination(
+        skip=0, limit=limit, count_mode=count_mode, after=decode_cursor(cursor)
+    )
+
+
+PaginationDep = Annotated[Pagination, Depends(get_pagination)]
+
+
+def _fits(value: Any, column: ColumnElement[Any]) -> bool:
+    column_type = column.type
+    if isinstance(column_type, TypeDecorator):
+        column_type = column_type.impl_instance
+    expected: type | UnionType
+    try:
+        expected = column_type.python_type
+    except NotImplementedError:
+        # an untyped expression, any scalar
+        expected = str | int | float
+    if expected is float:
+        expected = int | float
+    return value is None or isinstance(value, expected)
+
+
+def _expression(column: ColumnElement[Any] | Mapped[Any]) -> ColumnElement[Any]:
+    # a model attribute, e.g. col(Item.title), stands for its column
+    if isinstance(column, QueryableAttribute):
+        return column.expression
+    assert isinstance(column, ColumnElement)
+    return column
+
+
+def paginate(
+    session: Session,
+    statement: Select[Any],
+    pagination: Pagination,
+    *,
+    order_by: Sequence[ColumnElement[Any] | Mapped[Any]],
+    descending: bool = False,
+    key: Callable[[Any], Sequence[Any]] | None = None,
+) -> tuple[list[Any], str | None]:
+    """
+    Fetch one page of the statement, sorted by `order_by` (which must end
+    with a unique column) and return it along with the cursor of the next
+    one, None on the last page.
+
+    `key` extracts the sort values from a row, by default they're read from
+    the attributes of the same name.
+    """
+    columns = [_expression(column) for column in order_by]
+    if key is None:
+        names = [str(column.key) for column in columns]
+
+        def key(row: Any) -> list[Any]:
+            return [getattr(row, name) for name in names]
+
+    if pagination.after is not None:
+        # a cursor tampered with or from another endpoint, which the database
+        # would fail to compare with the sort key
+        if len(pagination.after) != len(columns) or not all(
+            _fits(value, column)
+            for value, column in zip(pagination.after, columns, strict=True)
+        ):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        sort_key = tuple_(*columns)
+        statement = statement.where(
+            sort_key < tuple(pagination.after)
+            if descending
+            else sort_key > tuple(pagination.after)
+        )
+    statement = statement.order_by(
+        *(column.desc() if descending else column for column in columns)
+    )
+    # one extra row tells whether there's a next page
+    statement = statement.offset(pagination.skip).limit(pagination.limit + 1)
+    rows: list[Any] = list(
+        session.scalars(statement)
+        if isinstance(statement, SelectOfScalar)
+        else session.execute(statement)
+    )
+    if len(rows) <= pagination.limit:
+        return rows, None
+    rows = rows[: pagination.limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def estimate_count(session: Session, statement: Select[Any]) -> int:
+    """
+    Approximate number of rows of the statement, from the table statistics
+    when it's a whole table, otherwise from the planner's row estimate.
+    """
+    froms = statement.get_final_froms()
+    if (
+        statement.whereclause is None
+        and len(froms) == 1
+        and isinstance(froms[0], Table)
+    ):
+        reltuples = session.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": froms[0].name},
+        ).scalar()
+        # -1 (or 0 before Postgres 14) until the table is first analyzed
+        if reltuples is not None and reltuples > 0:
+            return int(reltuples)
+    return int(explain(session, statement)["Plan"]["Plan Rows"])
+
+
+def count_rows(
+    session: Session, statement: Select[Any], pagination: Pagination
+) -> int | None:
+    """
+    Total number of rows of the (unpaginated) statement, per the count mode.
+    """
+    match pagination.count_mode:
+        case CountMode.none:
+            return None
+        case CountMode.estimate:
+            return estimate_count(session, statement)
+    count_statement = select(func.count()).select_from(statement.subquery())
+    return session.execute(count_statement).scalar_one()
@@ -1,53 +1,49 @@
 import uuid
-from typing import Any
 from datetime import datetime, timedelta
-import pytz
+from typing import Any
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+import pytz
+from fastapi import APIRouter, HTTPException, Response
+from sqlalchemy.orm import Session
+from sqlmodel import col, select
 
 from app.api.deps import CurrentUser, SessionDep
-from app.models import Book, BookCreate, BookPublic, BooksPublic, BookUpdate, Message, Restaurant
+from app.api.pagination import Pagination, PaginationDep, count_rows, paginate
+from app.api.responses import page_response
+from app.models import (
+    Book,
+    BookCreate,
+    BookPublic,
+    BooksPublic,
+    BookUpdate,
+    Message,
+    Restaurant,
+)
+from app.principal import UserPrincipal
 
 router = APIRouter()
 
 
-@router.get("/", response_model=BooksPublic)
-def read_books(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
-) -> Any:
-    """
-    Retrieve books.
-    """
+# shared with the async routes, which run them through `AsyncSession.run_sync`
+def books_page(
+    session: Session, current_user: UserPrincipal, pagination: Pagination
+) -> Response:
+    statement = select(Book)
+    if not current_user.is_superuser:
+        statement = statement.where(Book.owner_id == current_user.id)
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Book)
-        count = session.exec(count_statement).one()
-        statement = select(Book).offset(skip).limit(limit)
-        books = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Book)
-            .where(Book.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Book)
-            .where(Book.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        books = session.exec(statement).all()
-
-    return BooksPublic(data=books, count=count)
+    count = count_rows(session, statement, pagination)
+    books, next_cursor = paginate(
+        session,
+        statement,
+        pagination,
+        order_by=[col(Book.created_at), col(Book.id)],
+        descending=True,
+    )
+    return page_response(BooksPublic, books, count, next_cursor)
 
 
-@router.get("/{id}", response_model=BookPublic)
-def read_book(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
-    """
-    Get book by ID.
-    """
+def user_book(session: Session, current_user: UserPrincipal, id: uuid.UUID) -> Book:
     book = session.get(Book, id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
@@ -56,44 +52,77 @@ def read_book(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) ->
     return book
 
 
-@router.post("/", response_model=BookPublic)
-def create_book(
-    *, session: SessionDep, current_user: CurrentUser, book_in: BookCreate
-) -> Any:
+def new_book(
+    session: Session, current_user: UserPrincipal, book_in: BookCreate
+) -> Book:
     """
-    Create new book.
+    The book to create, not added to the session yet.
     """
     restaurant = session.get(Restaurant, book_in.restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
-    
-    # definindo os fusos horários
-    fuso_sao_paulo = pytz.timezone('America/Sao_Paulo')
-    fuso_utc = pytz.utc
-
-    # obtendo o horário atual em UTC
-    current_utc = datetime.utcnow().replace(tzinfo=fuso_utc)
 
-    # convertendo o horário da reserva de São Paulo para UTC
-    book_time_sao_paulo = book_in.reserved_for.replace(tzinfo=fuso_sao_paulo)
-    book_time_utc = book_time_sao_paulo.astimezone(fuso_utc)
-
-    # verificando se a reserva é para um horário futuro
+    # o horário da reserva é de São Paulo, comparado em UTC
+    current_utc = datetime.utcnow().replace(tzinfo=pytz.utc)
+    book_time_utc = book_in.reserved_for.replace(
+        tzinfo=pytz.timezone("America/Sao_Paulo")
+    ).astimezone(pytz.utc)
     if current_utc > book_time_utc:
         raise HTTPException(
             status_code=400, detail="A reserva deve ser feita em um horário futuro"
         )
-    
-    # verificando se a reserva está sendo feita com pelo menos 2 horas de antecedência
-    diferenca_tempo = book_time_utc - current_utc
-    if diferenca_tempo < timedelta(hours=2):
+    if book_time_utc - current_utc < timedelta(hours=2):
         raise HTTPException(
-            status_code=400, detail="A reserva deve ser feita com 2 horas de antecedência"
+            status_code=400,
+            detail="A reserva deve ser feita com 2 horas de antecedência",
         )
-    
+
     book = Book.model_validate(book_in, update={"owner_id": current_user.id})
     if restaurant.book_price <= 0:
         book.active = True
+    return book
+
+
+def book_to_update(
+    session: Session, current_user: UserPrincipal, id: uuid.UUID, book_in: BookUpdate
+) -> Book:
+    book = session.get(Book, id)
+    restaurant = session.get(Restaurant, book_in.restaurant_id)
+    if not restaurant:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    if not current_user.is_superuser and (book.owner_id != current_user.id):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return book
+
+
+@router.get("/", response_model=BooksPublic)
+def read_books(
+    session: SessionDep, current_user: CurrentUser, pagination: PaginationDep
+) -> Any:
+    """
+    Retrieve books.
+    """
+    return books_page(session, current_user, pagination)
+
+
+@router.get("/{id}", response_model=BookPublic)
+def read_book(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+    """
+    Get book by ID.
+    """
+    return user_book(session, current_user, id)
+
+
+@router.post("/", response_model=BookPublic)
+def create_book(
+    *, session: SessionDep, current_user: CurrentUser, book_in: BookCreate
+) -> Any:
+    """
+    Create new book.
+    """
+    book = new_book(session, current_user, book_in)
     session.add(book)
     session.commit()
     session.refresh(book)
@@ -111,14 +140,7 @@ def update_book(
     """
     Update an book.
     """
-    book = session.get(Book, id)
-    restaurant = session.get(Restaurant, book_in.restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if not current_user.is_superuser and (book.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    book = book_to_update(session, current_user, id, book_in)
     update_dict = book_in.model_dump(exclude_unset=True)
     book.sqlmodel_update(update_dict)
     session.add(book)
@@ -134,11 +156,7 @@ def delete_book(
     """
     Delete an book.
     """
-    book = session.get(Book, id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if not current_user.is_superuser and (book.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    book = user_book(session, current_user, id)
     session.delete(book)
     session.commit()
     return Message(message="Book deleted successfully")
@@ -1,44 +1,94 @@
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from fastapi import APIRouter, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from sqlmodel import col, select
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message, Restaurant
+from app import crud
+from app.api import conditional
+from app.api.deps import CurrentUser, ReadSessionDep, SessionDep
+from app.api.pagination import Pagination, PaginationDep, count_rows, paginate
+from app.api.responses import page_response
+from app.models import (
+    Item,
+    ItemCreate,
+    ItemPublic,
+    ItemsPublic,
+    ItemUpdate,
+    Message,
+    Restaurant,
+)
+from app.principal import UserPrincipal
 
 router = APIRouter()
 
 
+# shared with the async routes, which run them through `AsyncSession.run_sync`
+def items_page(
+    session: Session,
+    request: Request,
+    response: Response,
+    current_user: UserPrincipal,
+    pagination: Pagination,
+) -> Response:
+    statement = select(Item)
+    if not current_user.is_superuser:
+        statement = statement.where(Item.owner_id == current_user.id)
+    count = count_rows(session, statement, pagination)
+    items, next_cursor = paginate(
+        session, statement, pagination, order_by=[col(Item.title), col(Item.id)]
+    )
+    version = conditional.version(items, count, next_cursor)
+    if not_modified := conditional.check(request, response, version, public=False):
+        return not_modified
+    return page_response(ItemsPublic, items, count, next_cursor, response)
+
+
+def user_item(session: Session, current_user: UserPrincipal, id: uuid.UUID) -> Item:
+    item = session.get(Item, id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if not current_user.is_superuser and (item.owner_id != current_user.id):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return item
+
+
+def add_item(
+    session: Session, current_user: UserPrincipal, item_in: ItemCreate
+) -> Item:
+    restaurant = session.get(Restaurant, item_in.restaurant_id)
+    if not restaurant:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return crud.create_item(session=session, item_in=item_in, owner_id=current_user.id)
+
+
+def item_to_update(
+    session: Session, current_user: UserPrincipal, id: uuid.UUID, item_in: ItemUpdate
+) -> Item:
+    item = session.get(Item, id)
+    restaurant = session.get(Restaurant, item_in.restaurant_id)
+    if not restaurant:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if not current_user.is_superuser and (item.owner_id != current_user.id):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return item
+
+
 @router.get("/", response_model=ItemsPublic)
 def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    request: Request,
+    response: Response,
+    session: ReadSessionDep,
+    current_user: CurrentUser,
+    pagination: PaginationDep,
 ) -> Any:
     """
     Retrieve items.
     """
-
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
-        items = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        items = session.exec(statement).all()
-
-    return ItemsPublic(data=items, count=count)
+    return items_page(session, request, response, current_user, pagination)
 
 
 @router.get("/{id}", response_model=ItemPublic)
@@ -46,12 +96,7 @@ def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) ->
     """
     Get item by ID.
     """
-    item = session.get(Item, id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    return item
+    return user_item(session, current_user, id)
 
 
 @router.post("/", response_model=ItemPublic)
@@ -61,14 +106,7 @@ def create_item(
     """
     Create new item.
     """
-    restaurant = session.get(Restaurant, item_in.restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    item = Item.model_validate(item_in, update={"owner_id": current_user.id})
-    session.add(item)
-    session.commit()
-    session.refresh(item)
-    return item
+    return add_item(session, current_user, item_in)
 
 
 @router.put("/{id}", response_model=ItemPublic)
@@ -82,14 +120,7 @@ def update_item(
     """
     Update an item.
     """
-    item = session.get(Item, id)
-    restaurant = session.get(Restaurant, item_in.restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    item = item_to_update(session, current_user, id, item_in)
     update_dict = item_in.model_dump(exclude_unset=True)
     item.sqlmodel_update(update_dict)
     session.add(item)
@@ -105,11 +136,7 @@ def delete_item(
     """
     Delete an item.
     """
-    item = session.get(Item, id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    item = user_item(session, current_user, id)
     session.delete(item)
     session.commit()
     return Message(message="Item deleted successfully")
@@ -1,117 +1,80 @@
-from datetime import datetime, timedelta
+import hashlib
+import secrets
 import uuid
-from typing import Any, Union
+from decimal import Decimal, InvalidOperation
+from typing import Annotated, Any, Union
 
-from app.payment import create_immediate_charge, detail_charge
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from fastapi import APIRouter, Header, HTTPException, Response
+from sqlalchemy.orm import Session
+from sqlmodel import col, select
 
+from app import crud
 from app.api.deps import CurrentUser, SessionDep
-from app.models import Book, Charge, Payment, PaymentCreate, PaymentCharge, PaymentPublic, PaymentsPublic, PaymentUpdate, Message, Restaurant
+from app.api.pagination import Pagination, PaginationDep, count_rows, paginate
+from app.api.responses import page_response
 from app.core.config import settings
+from app.models import (
+    Book,
+    Charge,
+    Message,
+    Payment,
+    PaymentCharge,
+    PaymentCreate,
+    PaymentPublic,
+    PaymentsPublic,
+    PaymentUpdate,
+    PixWebhook,
+    Restaurant,
+)
+from app.payment import (
+    PixError,
+    charge_status,
+    create_immediate_charge,
+    detail_charge,
+    paid_charges,
+)
+from app.principal import UserPrincipal
 
 router = APIRouter()
 
 
-@router.get("/", response_model=PaymentsPublic)
-def read_payments(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
-) -> Any:
-    """
-    Retrieve payments.
-    """
-
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Payment)
-        count = session.exec(count_statement).one()
-        statement = select(Payment).offset(skip).limit(limit)
-        payments = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Payment)
-            .where(Payment.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Payment)
-            .where(Payment.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        payments = session.exec(statement).all()
+# shared with the async routes, which run them through `AsyncSession.run_sync`
+def payments_page(
+    session: Session, current_user: UserPrincipal, pagination: Pagination
+) -> Response:
+    statement = select(Payment)
+    if not current_user.is_superuser:
+        statement = statement.where(Payment.owner_id == current_user.id)
 
-    return PaymentsPublic(data=payments, count=count)
+    count = count_rows(session, statement, pagination)
+    payments, next_cursor = paginate(
+        session,
+        statement,
+        pagination,
+        order_by=[col(Payment.created_at), col(Payment.id)],
+        descending=True,
+    )
+    return page_response(PaymentsPublic, payments, count, next_cursor)
 
 
-@router.get("/{id}", response_model=PaymentCharge)
-def read_payment(
-    session: SessionDep, current_user: CurrentUser, id: uuid.UUID
-) -> Any:
-    """
-    Get payment by ID.
-    """
+def user_payment(
+    session: Session, current_user: UserPrincipal, id: uuid.UUID
+) -> Payment:
     payment = session.get(Payment, id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
-    book = session.get(Book, payment.book_id)
-    
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
 
     if not current_user.is_superuser and (payment.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-
-    if not payment.token:
-        return PaymentCharge.model_validate(payment, update={"charge": None})
-    
-    charge_data = detail_charge(payment.token)
-    new_status = "pending"
-    changed = False
-
-    if not charge_data:
-        new_status = "failed"
-    else:
-        charge: Charge = Charge(**charge_data)
-        match charge.status:
-            case "CONCLUIDA":
-                new_status = "paid"
-                book.active = True
-                session.add(book)
-            case "REMOVIDA_PELO_USUARIO_RECEBEDOR" | "REMOVIDA_PELO_PSP":
-                new_status = "cancelled"
-        # check if charge has expired
-        if charge.status == "ATIVA" and new_status == "pending" and charge.calendario != None and payment.status != "cancelled":
-            criacao: datetime = charge.calendario.criacao
-            expiracao: int = charge.calendario.expiracao
-            if criacao and expiracao:
-                now = datetime.now(criacao.tzinfo)
-                expiration = criacao + timedelta(seconds=expiracao)
-                if now > expiration:
-                    new_status = "cancelled"
-
-    # update payment status if it has changed
-    if payment.status != new_status and payment.status != "cancelled":
-        payment.status = new_status
-        changed = True
-
-    if changed:
-        session.add(payment)
-        session.commit()
-        session.refresh(payment)
-
-    # create PaymentCharge with updated charge
-    payment_charge = PaymentCharge.model_validate(payment, update={"charge": charge if charge else None})
-
-    return payment_charge
+    return payment
 
 
-@router.post("/", response_model=PaymentCharge)
-def create_payment(
-    *, session: SessionDep, current_user: CurrentUser, payment_in: PaymentCreate
-) -> Any:
+def payable_restaurant(
+    session: Session, current_user: UserPrincipal, payment_in: PaymentCreate
+) -> Restaurant:
     """
-    Create new payment.
+    The restaurant the payment's book is charged by, once the book and the
+    user can be charged.
     """
     book = session.get(Book, payment_in.book_id)
     if not book:
@@ -125,17 +88,115 @@ def create_payment(
         raise HTTPException(status_code=400, detail="User CPF is invalid")
     if not current_user.full_name:
         raise HTTPException(status_code=400, detail="User full name is invalid")
-        
+    return restaurant
+
+
+def pending_payment(
+    session: Session, current_user: UserPrincipal, book_id: uuid.UUID
+) -> Payment | None:
+    """
+    The user's latest pending payment of the book with a charge, if any.
+    """
+    statement = (
+        select(Payment)
+        .where(
+            Payment.book_id == book_id,
+            Payment.owner_id == current_user.id,
+            Payment.status == "pending",
+            col(Payment.token).is_not(None),
+        )
+        .order_by(col(Payment.created_at).desc())
+        .limit(1)
+    )
+    return session.scalars(statement).first()
+
+
+def payment_to_update(
+    session: Session,
+    current_user: UserPrincipal,
+    id: uuid.UUID,
+    payment_in: PaymentUpdate,
+) -> Payment:
+    payment = session.get(Payment, id)
+    book = session.get(Book, payment_in.book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return payment
+
+
+@router.get("/", response_model=PaymentsPublic)
+def read_payments(
+    session: SessionDep, current_user: CurrentUser, pagination: PaginationDep
+) -> Any:
+    """
+    Retrieve payments.
+    """
+    return payments_page(session, current_user, pagination)
+
+
+@router.get("/{id}", response_model=PaymentCharge)
+def read_payment(
+    session: SessionDep, current_user: CurrentUser, id: uuid.UUID
+) -> Any:
+    """
+    Get payment by ID.
+
+    Only reads the database, the status is kept up to date by the PSP webhook
+    and the reconciler (`python -m app.reconcile`, its own service in
+    docker-compose.yml). The charge comes with the response that created it.
+    """
+    payment = user_payment(session, current_user, id)
+    return PaymentCharge.model_validate(payment, update={"charge": None})
+
+
+def _active_charge(
+    session: SessionDep, current_user: CurrentUser, book_id: uuid.UUID
+) -> PaymentCharge | None:
+    """
+    The pending payment of the book whose charge can still be paid, if any.
+    """
+    payment = pending_payment(session, current_user, book_id)
+    if not payment or not payment.token:
+        return None
+    try:
+        charge_data = detail_charge(payment.token)
+    except PixError:
+        raise HTTPException(status_code=503, detail="Payment provider unavailable")
+    if not charge_data:
+        return None
+    charge = Charge(**charge_data)
+    if charge_status(charge) != "pending":
+        return None
+    return PaymentCharge.model_validate(payment, update={"charge": charge})
+
+
+def _create_payment(
+    session: SessionDep, current_user: CurrentUser, payment_in: PaymentCreate
+) -> PaymentCharge:
+    restaurant = payable_restaurant(session, current_user, payment_in)
+
+    # paying the same book again gets the charge that is still open
+    active = _active_charge(session, current_user, payment_in.book_id)
+    if active:
+        return active
+
     payment = Payment.model_validate(payment_in, update={"owner_id": current_user.id, "value": restaurant.book_price})
-    charge_data: dict = create_immediate_charge(
-        # expiration=360,
-        expiration=30,
-        cpf=str(current_user.cpf),
-        name=str(current_user.full_name),
-        value=int(restaurant.book_price),
-        key=str(settings.EFIPAY_EVP_KEY),
-        description=f"booking in {restaurant.name}",
-    ) # type: ignore
+    try:
+        charge_data = create_immediate_charge(
+            # expiration=360,
+            expiration=30,
+            cpf=str(current_user.cpf),
+            name=str(current_user.full_name),
+            value=int(restaurant.book_price),
+            key=str(settings.EFIPAY_EVP_KEY),
+            description=f"booking in {restaurant.name}",
+        )
+    except PixError:
+        raise HTTPException(status_code=503, detail="Payment provider unavailable")
     if not isinstance(charge_data, dict) or not charge_data:
         print(charge_data)
         raise HTTPException(status_code=500, detail="Create payment failed")
@@ -155,6 +216,113 @@ def create_payment(
     return response
 
 
+@router.post("/", response_model=PaymentCharge)
+def create_payment(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    payment_in: PaymentCreate,
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+) -> Any:
+    """
+    Create new payment.
+
+    Retries sent with the same `Idempotency-Key` header get the response of
+    the first request instead of creating another charge.
+    """
+    if not idempotency_key:
+        return _create_payment(session, current_user, payment_in)
+
+    request_hash = hashlib.sha256(payment_in.model_dump_json().encode()).hexdigest()
+    previous = crud.claim_idempotency_key(
+        session=session,
+        owner_id=current_user.id,
+        key=idempotency_key,
+        request_hash=request_hash,
+        ttl=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+    )
+    if previous is not None:
+        if previous.request_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key already used for a different request",
+            )
+        if previous.response is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is in progress",
+            )
+        return PaymentCharge.model_validate(previous.response)
+
+    try:
+        response = _create_payment(session, current_user, payment_in)
+    except BaseException:
+        session.rollback()
+        crud.release_idempotency_key(
+            session=session, owner_id=current_user.id, key=idempotency_key
+        )
+        raise
+    crud.save_idempotent_response(
+        session=session,
+        owner_id=current_user.id,
+        key=idempotency_key,
+        response=response.model_dump(mode="json"),
+    )
+    return response
+
+
+def received_charges(notification: PixWebhook, hmac: str | None) -> dict[str, int]:
+    """
+    Amount received for each charge (txid -> cents) in a webhook batch.
+    """
+    if not settings.EFIPAY_WEBHOOK_HMAC:
+        # anyone could post to the webhook, only accepted when developing
+        if settings.ENVIRONMENT != "local":
+            raise HTTPException(status_code=403, detail="Webhook is not configured")
+    elif not secrets.compare_digest(hmac or "", settings.EFIPAY_WEBHOOK_HMAC):
+        raise HTTPException(status_code=403, detail="Invalid webhook signature")
+
+    # the same PIX may come more than once, count each endToEndId only once
+    received: dict[str, tuple[str, int]] = {}
+    for pix in notification.pix:
+        if not pix.txid:
+            # a transfer to the key, not the payment of one of our charges
+            continue
+        try:
+            amount = int(Decimal(pix.valor) * 100)
+        except InvalidOperation:
+            raise HTTPException(status_code=400, detail="Invalid PIX value")
+        received[pix.endToEndId] = (pix.txid, amount)
+    charges: dict[str, int] = {}
+    for txid, amount in received.values():
+        charges[txid] = charges.get(txid, 0) + amount
+    return charges
+
+
+# the PSP posts to the registered URL with /pix appended
+@router.post("/webhook")
+@router.post("/webhook/pix")
+def pix_webhook(
+    session: SessionDep, notification: PixWebhook, hmac: str | None = None
+) -> Message:
+    """
+    Receive PIX payment notifications from the PSP.
+
+    A batch settles all its payments at once and redelivered notifications
+    are ignored, so the PSP can retry freely. Only the charges the PSP
+    confirms as paid when asked again are settled.
+    """
+    charges = received_charges(notification, hmac)
+    try:
+        confirmed = paid_charges(list(charges))
+    except PixError:
+        raise HTTPException(status_code=503, detail="Payment provider unavailable")
+    paid = crud.pay_charges(
+        session=session, charges={txid: charges[txid] for txid in confirmed}
+    )
+    return Message(message=f"{len(paid)} payments settled")
+
+
 @router.put("/{id}", response_model=PaymentPublic)
 def update_payment(
     *,
@@ -166,19 +334,9 @@ def update_payment(
     """
     Update an payment.
     """
-    payment = session.get(Payment, id)
-    book = session.get(Book, payment_in.book_id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
-    if not current_user.is_superuser:
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    update_dict = payment_in.model_dump(exclude_unset=True)
-    payment.sqlmodel_update(update_dict)
-    session.add(payment)
-    session.commit()
-    session.refresh(payment)
+    payment = payment_to_update(session, current_user, id, payment_in)
+    if not crud.update_payment(session=session, payment=payment, payment_in=payment_in):
+        raise HTTPException(status_code=400, detail="Invalid payment status change")
     return payment
 
 
@@ -189,11 +347,7 @@ def delete_payment(
     """
     Delete an payment.
     """
-    payment = session.get(Payment, id)
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
-    if not current_user.is_superuser and (payment.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    payment = user_payment(session, current_user, id)
     session.delete(payment)
     session.commit()
     return Message(message="Payment deleted successfully")
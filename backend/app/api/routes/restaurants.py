@@ -1,143 +1,321 @@
-from datetime import datetime
 import uuid
-from typing import Any
-
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import func, select
-from sqlalchemy import or_, case, literal_column
-
-from app.api.deps import CurrentUser, SessionDep
+from collections.abc import Sequence
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import Select
+from sqlalchemy.orm import Session, selectinload
+from sqlmodel import col, select
+
+from app import schedule, search
+from app.api import conditional
+from app.api.deps import CurrentUser, ReadSessionDep, SessionDep
+from app.api.pagination import (
+    CountMode,
+    Pagination,
+    PaginationDep,
+    count_rows,
+    paginate,
+)
+from app.api.responses import json_response, page_response
 from app.models import (
+    Book,
+    BooksPublic,
+    Item,
+    ItemsPublic,
+    Message,
     OperatingDateTime,
+    OperatingDateTimeBase,
     OperatingDateTimeCreate,
     OperatingDateTimeUpdate,
-    OperatingDateTimeBase,
     Restaurant,
     RestaurantCreate,
     RestaurantFull,
     RestaurantPublic,
     RestaurantsPublic,
     RestaurantUpdate,
-    Message,
     WeekEnum,
 )
+from app.principal import UserPrincipal
 
 router = APIRouter()
 
 # DO NOT CHANGE THIS FUNCTION ORDER, IT WILL BREAK THE SERVER(I don't know why)
 @router.get("/search", response_model=RestaurantsPublic)
 def search_restaurants(
-    *, session: SessionDep, query: str, skip: int = 0, limit: int = 100
+    *,
+    session: ReadSessionDep,
+    pagination: PaginationDep,
+    query: str,
+    mode: search.SearchMode = search.SearchMode.fulltext,
 ) -> Any:
     """
     Search for restaurants based on a query string.
+
+    `fulltext` matches whole words (or their beginning), `fuzzy` tolerates
+    typos and accents, e.g. "pizaria" finds "Pizzaria".
     """
+    return search_page(session, pagination, query, mode)
+
+
+# shared with the async routes, like the other helpers of this module, which
+# they run through `AsyncSession.run_sync`
+def search_page(
+    session: Session, pagination: Pagination, query: str, mode: search.SearchMode
+) -> Any:
     if not query.strip():
         raise HTTPException(status_code=400, detail="Query string is empty")
-    query_words = query.strip().split()
-
-    # initialize the relevance column
-    relevance = literal_column("0")
-    search_conditions = []
-    
-    for word in query_words:
-        like_pattern = f"%{word}%"
-
-        # add search conditions
-        condition = or_(
-            Restaurant.name.ilike(like_pattern),
-            Restaurant.description.ilike(like_pattern),
-            Restaurant.address.ilike(like_pattern),
-        )
-        search_conditions.append(condition)
 
-        # add weights
-        # TODO: change the weights to be configurable
-        relevance += case(
-            (Restaurant.name.ilike(like_pattern), literal_column("3")),
-            else_=literal_column("0")
-        )
-        relevance += case(
-            (Restaurant.description.ilike(like_pattern), literal_column("2")),
-            else_=literal_column("0")
-        )
-        relevance += case(
-            (Restaurant.address.ilike(like_pattern), literal_column("1")),
-            else_=literal_column("0")
-        )
+    found = search.search_statement(query, mode)
+    matches = search.match_statement(query, mode)
+    if found is None or matches is None:
+        return RestaurantsPublic(data=[], count=0)
+    statement, relevance = found
+
+    search.prepare(session, mode)
+    results, next_cursor = paginate(
+        session,
+        statement,
+        pagination,
+        order_by=[relevance, col(Restaurant.id)],
+        descending=True,
+        key=lambda result: (result.relevance, result[0].id),
+    )
+    restaurants = [result[0] for result in results]
+    if pagination.count_mode != CountMode.exact:
+        count = count_rows(session, matches, pagination)
+    elif results and pagination.after is None:
+        count = results[0].total
+    elif pagination.skip or pagination.after is not None:
+        # the window count only sees the rows past the cursor, or none at all
+        # past the last page
+        count = count_rows(session, matches, pagination)
+    else:
+        count = 0
 
-    #combine all search conditions
-    combined_condition = or_(*search_conditions)
+    return page_response(RestaurantsPublic, restaurants, count, next_cursor)
 
-    # build the query statement
-    statement = (
-        select(Restaurant, relevance.label('relevance'))
-        .where(combined_condition)
-        .order_by(relevance.desc())
-        .offset(skip)
-        .limit(limit)
-    )
 
-    results = session.exec(statement).all()
-    restaurants = [result[0] for result in results]
-    count_statement = select(func.count()).select_from(
-        select(Restaurant.id).where(combined_condition).subquery()
+def restaurants_statement(only_open: bool) -> Select[Any]:
+    """
+    The restaurants to list, only those open now with `only_open`.
+    """
+    statement = select(Restaurant)
+    if not only_open:
+        return statement
+    return statement.where(
+        col(Restaurant.id).in_(schedule.open_restaurant_ids(schedule.now()))
     )
-    count = session.exec(count_statement).one()
 
-    return RestaurantsPublic(data=restaurants, count=count)
 
 @router.get("/", response_model=RestaurantsPublic)
 def read_restaurants(
-    # session: SessionDep, skip: int = 0, limit: int = 100, only_open: bool = True
-    session: SessionDep, skip: int = 0, limit: int = 100, only_open: bool = False # TODO: change this later
+    request: Request,
+    response: Response,
+    session: ReadSessionDep,
+    pagination: PaginationDep,
+    only_open: bool = True,
 ) -> Any:
     """
     Retrieve restaurants.
     """
-    if only_open:
-        current_datetime = datetime.now()
-        current_day_of_week = current_datetime.strftime('%A')  # Exemplo: 'Monday'
-        current_time_str = current_datetime.strftime('%H:%M')  # Exemplo: '14:30'
-
-        base_query = (
-            select(Restaurant)
-            .join(OperatingDateTime, Restaurant.id == OperatingDateTime.restaurant_id)
-            .where(
-                OperatingDateTime.day_of_week == current_day_of_week,
-                OperatingDateTime.open_time <= current_time_str,
-                OperatingDateTime.close_time > current_time_str,
-            )
-            .distinct()
-        )
+    return restaurants_page(session, request, response, pagination, only_open)
+
+
+def restaurants_page(
+    session: Session,
+    request: Request,
+    response: Response,
+    pagination: Pagination,
+    only_open: bool,
+) -> Response:
+    statement = restaurants_statement(only_open)
+    count = count_rows(session, statement, pagination)
+    restaurants, next_cursor = paginate(
+        session,
+        statement,
+        pagination,
+        order_by=[col(Restaurant.name), col(Restaurant.id)],
+    )
+    version = conditional.version(restaurants, count, next_cursor)
+    if not_modified := conditional.check(request, response, version):
+        return not_modified
+    return page_response(RestaurantsPublic, restaurants, count, next_cursor, response)
 
-        count_subquery = base_query.alias()
-        count_statement = select(func.count()).select_from(count_subquery)
-        count = session.exec(count_statement).one()
 
-        statement = base_query.offset(skip).limit(limit)
+# how many items and books GET /{id} embeds, the rest is paginated by
+# GET /{id}/items and /{id}/books
+EmbeddedLimit = Annotated[int, Query(ge=0, le=100)]
 
-    else:
-        count_statement = select(func.count()).select_from(Restaurant)
-        count = session.exec(count_statement).one()
 
-        statement = select(Restaurant).offset(skip).limit(limit)
+def restaurant_full(
+    session: Session, id: uuid.UUID, items_limit: int, books_limit: int
+) -> tuple[RestaurantFull, conditional.Version] | None:
+    """
+    The restaurant with its operating times, first items and latest books,
+    and the version of all of them.
+
+    A LIMIT per parent can't go through `selectinload`, so the capped
+    collections are read on their own, each from its index.
+    """
+    restaurant = session.scalars(
+        select(Restaurant)
+        .where(Restaurant.id == id)
+        .options(selectinload(Restaurant.operating_date_times))  # type: ignore[arg-type]
+    ).first()
+    if not restaurant:
+        return None
+    items = session.scalars(
+        select(Item)
+        .where(Item.restaurant_id == id)
+        .order_by(col(Item.title), col(Item.id))
+        .limit(items_limit)
+    ).all()
+    books = session.scalars(
+        select(Book)
+        .where(Book.restaurant_id == id)
+        .order_by(col(Book.created_at).desc(), col(Book.id).desc())
+        .limit(books_limit)
+    ).all()
+    version = conditional.version(
+        [restaurant, *restaurant.operating_date_times, *items, *books]
+    )
+    full = RestaurantFull.model_validate(
+        restaurant, update={"items": items, "books": books}
+    )
+    return full, version
 
-    restaurants = session.exec(statement).all()
-    return RestaurantsPublic(data=restaurants, count=count)
+
+def restaurant_exists(session: Session, id: uuid.UUID) -> bool:
+    statement = select(Restaurant.id).where(Restaurant.id == id)
+    return session.scalars(statement).first() is not None
 
 
 @router.get("/{id}", response_model=RestaurantFull)
-def read_restaurant(session: SessionDep, id: uuid.UUID) -> Any:
+def read_restaurant(
+    request: Request,
+    response: Response,
+    session: ReadSessionDep,
+    id: uuid.UUID,
+    items_limit: EmbeddedLimit = 20,
+    books_limit: EmbeddedLimit = 20,
+) -> Any:
+    """
+    Get restaurant by ID, with its first `items_limit` items and latest
+    `books_limit` books.
+    """
+    found = restaurant_full(session, id, items_limit, books_limit)
+    if not found:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    restaurant, version = found
+    # the books name who booked them, not for shared caches
+    if not_modified := conditional.check(request, response, version, public=False):
+        return not_modified
+    return json_response(RestaurantFull, restaurant, response)
+
+
+@router.get("/{id}/items", response_model=ItemsPublic)
+def read_restaurant_items(
+    request: Request,
+    response: Response,
+    session: ReadSessionDep,
+    id: uuid.UUID,
+    pagination: PaginationDep,
+) -> Any:
+    """
+    Retrieve the items of a restaurant.
+    """
+    return restaurant_items_page(session, request, response, id, pagination)
+
+
+def restaurant_items_page(
+    session: Session,
+    request: Request,
+    response: Response,
+    id: uuid.UUID,
+    pagination: Pagination,
+) -> Response:
+    if not restaurant_exists(session, id):
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    statement = select(Item).where(Item.restaurant_id == id)
+    count = count_rows(session, statement, pagination)
+    items, next_cursor = paginate(
+        session, statement, pagination, order_by=[col(Item.title), col(Item.id)]
+    )
+    version = conditional.version(items, count, next_cursor)
+    if not_modified := conditional.check(request, response, version):
+        return not_modified
+    return page_response(ItemsPublic, items, count, next_cursor, response)
+
+
+@router.get("/{id}/books", response_model=BooksPublic)
+def read_restaurant_books(
+    request: Request,
+    response: Response,
+    session: ReadSessionDep,
+    id: uuid.UUID,
+    pagination: PaginationDep,
+) -> Any:
     """
-    Get restaurant by ID.
+    Retrieve the books of a restaurant, latest first.
     """
+    return restaurant_books_page(session, request, response, id, pagination)
+
+
+def restaurant_books_page(
+    session: Session,
+    request: Request,
+    response: Response,
+    id: uuid.UUID,
+    pagination: Pagination,
+) -> Response:
+    if not restaurant_exists(session, id):
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    statement = select(Book).where(Book.restaurant_id == id)
+    count = count_rows(session, statement, pagination)
+    books, next_cursor = paginate(
+        session,
+        statement,
+        pagination,
+        order_by=[col(Book.created_at), col(Book.id)],
+        descending=True,
+    )
+    version = conditional.version(books, count, next_cursor)
+    if not_modified := conditional.check(request, response, version, public=False):
+        return not_modified
+    return page_response(BooksPublic, books, count, next_cursor, response)
+
+
+def owned_restaurant(
+    session: Session, current_user: UserPrincipal, id: uuid.UUID
+) -> Restaurant:
     restaurant = session.get(Restaurant, id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
+    if not current_user.is_superuser and (restaurant.owner_id != current_user.id):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
     return restaurant
 
 
+def operating_times_of(
+    session: Session, restaurant_id: uuid.UUID
+) -> Sequence[OperatingDateTime]:
+    return session.scalars(
+        select(OperatingDateTime).where(OperatingDateTime.restaurant_id == restaurant_id)
+    ).all()
+
+
+def operating_time_of(
+    session: Session, restaurant_id: uuid.UUID, day_of_week: WeekEnum
+) -> OperatingDateTime | None:
+    return session.scalars(
+        select(OperatingDateTime).where(
+            OperatingDateTime.restaurant_id == restaurant_id,
+            OperatingDateTime.day_of_week == day_of_week,
+        )
+    ).first()
+
+
 @router.post("/", response_model=RestaurantPublic)
 def create_restaurant(
     *,
@@ -166,11 +344,7 @@ def update_restaurant(
     """
     Update a restaurant.
     """
-    restaurant = session.get(Restaurant, id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not current_user.is_superuser and (restaurant.owner_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    restaurant = owned_restaurant(session, current_user, id)
     update_dict = restaurant_in.model_dump(exclude_unset=True)
     restaurant.sqlmodel_update(update_dict)
     session.add(restaurant)
@@ -186,11 +360,7 @@ def delete_restaurant(
     """
     Delete a restaurant.
     """
-    restaurant = session.get(Restaurant, id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not current_user.is_superuser and (restaurant.owner_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    restaurant = owned_restaurant(session, current_user, id)
     session.delete(restaurant)
     session.commit()
     return Message(message="Restaurant deleted successfully")
@@ -205,15 +375,8 @@ def get_operating_date_times(
     """
     Get all operating date times for a restaurant.
     """
-    restaurant = session.get(Restaurant, restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not current_user.is_superuser and (restaurant.owner_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-    operating_times = session.exec(
-        select(OperatingDateTime).where(OperatingDateTime.restaurant_id == restaurant_id)
-    ).all()
-    return operating_times
+    owned_restaurant(session, current_user, restaurant_id)
+    return operating_times_of(session, restaurant_id)
 
 
 @router.post("/{restaurant_id}/operating_date_times/", response_model=OperatingDateTimeBase)
@@ -227,19 +390,8 @@ def create_operating_date_time(
     """
     Create a new operating date time for a restaurant.
     """
-    restaurant = session.get(Restaurant, restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not current_user.is_superuser and (restaurant.owner_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-    existing_operating_time = session.exec(
-        select(OperatingDateTime)
-        .where(
-            OperatingDateTime.restaurant_id == restaurant_id,
-            OperatingDateTime.day_of_week == operating_time_in.day_of_week,
-        )
-    ).first()
-    if existing_operating_time:
+    owned_restaurant(session, current_user, restaurant_id)
+    if operating_time_of(session, restaurant_id, operating_time_in.day_of_week):
         raise HTTPException(
             status_code=400, detail="Operating date time for this day already exists"
         )
@@ -264,19 +416,11 @@ def update_operating_date_time(
     """
     Update an operating date time for a restaurant.
     """
-    restaurant = session.get(Restaurant, restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not current_user.is_superuser and (restaurant.owner_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    owned_restaurant(session, current_user, restaurant_id)
     # operating_time = session.get(OperatingDateTime, id)
-    operating_time = session.exec(
-        select(OperatingDateTime)
-        .where(
-            OperatingDateTime.restaurant_id == restaurant_id,
-            OperatingDateTime.day_of_week == operating_time_in.day_of_week,
-        ),
-    ).first()
+    operating_time = operating_time_of(
+        session, restaurant_id, operating_time_in.day_of_week
+    )
     if not operating_time:
         raise HTTPException(status_code=404, detail="Operating date time not found")
     update_dict = operating_time_in.model_dump(exclude_unset=True)
@@ -298,19 +442,9 @@ def delete_operating_date_time(
     """
     Delete an operating date time for a restaurant.
     """
-    restaurant = session.get(Restaurant, restaurant_id)
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    if not current_user.is_superuser and (restaurant.owner_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    owned_restaurant(session, current_user, restaurant_id)
     # operating_time = session.get(OperatingDateTime, id)
-    operating_time = session.exec(
-        select(OperatingDateTime)
-        .where(
-            OperatingDateTime.restaurant_id == restaurant_id,
-            OperatingDateTime.day_of_week == week_day,
-        ),
-    ).first()
+    operating_time = operating_time_of(session, restaurant_id, week_day)
     if not operating_time:
         raise HTTPException(status_code=404, detail="Operating date time not found")
     session.delete(operating_time)
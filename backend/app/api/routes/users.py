@@ -2,20 +2,24 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlmodel import col, delete, select
 
 from app import crud
 from app.api.deps import (
+    CurrentDBUser,
     CurrentUser,
     SessionDep,
     get_current_active_superuser,
 )
+from app.api.pagination import PaginationDep, count_rows, paginate
+from app.api.responses import page_response
 from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
 from app.models import (
     Item,
     Message,
-    Payment,
     UpdatePassword,
     User,
     UserCreate,
@@ -26,6 +30,7 @@ from app.models import (
     UserUpdateMe,
     UserMe,
 )
+from app.principal import principal_cache
 from app.utils import generate_new_account_email, send_email
 
 router = APIRouter()
@@ -36,18 +41,18 @@ router = APIRouter()
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(session: SessionDep, pagination: PaginationDep) -> Any:
     """
     Retrieve users.
     """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
+    statement = select(User)
+    count = count_rows(session, statement, pagination)
+    users, next_cursor = paginate(
+        session, statement, pagination, order_by=[col(User.email), col(User.id)]
+    )
 
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
-
-    return UsersPublic(data=users, count=count)
+    return page_response(UsersPublic, users, count, next_cursor)
 
 
 @router.post(
@@ -57,20 +62,21 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user_email = crud.get_user_by_email(session=session, email=user_in.email)
-    user_cpf = crud.get_user_by_cpf(session=session, cpf=str(user_in.cpf))
-    if user_email:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this email already exists in the system.",
-        )
-    if user_cpf:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this CPF already exists in the system.",
-        )
-
-    user = crud.create_user(session=session, user_create=user_in)
+    try:
+        user = crud.create_user(session=session, user_create=user_in)
+    except IntegrityError as e:
+        match crud.duplicate_user_field(e):
+            case "email":
+                raise HTTPException(
+                    status_code=400,
+                    detail="The user with this email already exists in the system.",
+                )
+            case "cpf":
+                raise HTTPException(
+                    status_code=400,
+                    detail="The user with this CPF already exists in the system.",
+                )
+        raise
     if settings.emails_enabled and user_in.email:
         email_data = generate_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
@@ -85,7 +91,7 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
 
 @router.patch("/me", response_model=UserPublic)
 def update_user_me(
-    *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser
+    *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentDBUser
 ) -> Any:
     """
     Update own user.
@@ -101,13 +107,14 @@ def update_user_me(
     current_user.sqlmodel_update(user_data)
     session.add(current_user)
     session.commit()
+    principal_cache.invalidate(current_user.id)
     session.refresh(current_user)
     return current_user
 
 
 @router.patch("/me/password", response_model=Message)
 def update_password_me(
-    *, session: SessionDep, body: UpdatePassword, current_user: CurrentUser
+    *, session: SessionDep, body: UpdatePassword, current_user: CurrentDBUser
 ) -> Any:
     """
     Update own password.
@@ -122,6 +129,7 @@ def update_password_me(
     current_user.hashed_password = hashed_password
     session.add(current_user)
     session.commit()
+    principal_cache.invalidate(current_user.id)
     return Message(message="Password updated successfully")
 
 
@@ -130,20 +138,22 @@ def read_user_me(current_user: CurrentUser, session: SessionDep) -> Any:
     """
     Get current user.
     """
-    for book in current_user.books:
-        if not book.active:
-            book_payments = session.exec(select(Payment).where(Payment.book_id == book.id)).all()
-            for payment in book_payments:
-                if payment.status == "paid":
-                    book.active = True
-                    session.add(book)
-                    session.commit()
-                    session.refresh(book)
-    return current_user
+    # restaurants, books and payments in one query each instead of lazy loads
+    statement = (
+        select(User)
+        .where(User.id == current_user.id)
+        .options(
+            selectinload(User.restaurants),  # type: ignore[arg-type]
+            selectinload(User.books),  # type: ignore[arg-type]
+            selectinload(User.payments),  # type: ignore[arg-type]
+        )
+        .execution_options(populate_existing=True)
+    )
+    return session.exec(statement).one()
 
 
 @router.delete("/me", response_model=Message)
-def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
+def delete_user_me(session: SessionDep, current_user: CurrentDBUser) -> Any:
     """
     Delete own user.
     """
@@ -155,6 +165,7 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
     session.exec(statement)  # type: ignore
     session.delete(current_user)
     session.commit()
+    principal_cache.invalidate(current_user.id)
     return Message(message="User deleted successfully")
 
 
@@ -163,21 +174,22 @@ def register_user(session: SessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user_email = crud.get_user_by_email(session=session, email=user_in.email)
-    user_cpf = crud.get_user_by_cpf(session=session, cpf=str(user_in.cpf))
-    if user_email:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this email already exists in the system",
-        )
-    if user_cpf:
-        raise HTTPException(
-            status_code=400,
-            detail="The user with this CPF already exists in the system",
-        )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
-    return user
+    try:
+        return crud.create_user(session=session, user_create=user_create)
+    except IntegrityError as e:
+        match crud.duplicate_user_field(e):
+            case "email":
+                raise HTTPException(
+                    status_code=400,
+                    detail="The user with this email already exists in the system",
+                )
+            case "cpf":
+                raise HTTPException(
+                    status_code=400,
+                    detail="The user with this CPF already exists in the system",
+                )
+        raise
 
 
 @router.get("/{user_id}", response_model=UserPublic)
@@ -188,7 +200,7 @@ def read_user_by_id(
     Get a specific user by id.
     """
     user = session.get(User, user_id)
-    if user == current_user:
+    if user_id == current_user.id:
         return user
     if not current_user.is_superuser:
         raise HTTPException(
@@ -240,7 +252,7 @@ def delete_user(
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if user == current_user:
+    if user.id == current_user.id:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
@@ -248,4 +260,5 @@ def delete_user(
     session.exec(statement)  # type: ignore
     session.delete(user)
     session.commit()
+    principal_cache.invalidate(user_id)
     return Message(message="User deleted successfully")
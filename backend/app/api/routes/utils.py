@@ -1,8 +1,11 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
-from app.models import Message
+from app.core.pool import pool_metrics
+from app.models import Message, PoolStats
 from app.utils import generate_test_email, send_email
 
 router = APIRouter()
@@ -29,3 +32,19 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get(
+    "/metrics/db-pool/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=list[PoolStats],
+)
+def db_pool_metrics() -> list[dict[str, Any]]:
+    """
+    Connection pool usage of this worker process.
+
+    `wait_seconds_buckets` counts checkouts by how long they waited for a
+    connection (upper bound in seconds), waits and timeouts going up mean the
+    pool is too small for the load.
+    """
+    return [metrics.snapshot() for metrics in pool_metrics.values()]
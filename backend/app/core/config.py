@@ -68,6 +68,62 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # read replicas, as a comma separated list of host[:port], for the
+    # catalog endpoints (restaurants, search, items). The database, user and
+    # password default to the primary's
+    POSTGRES_REPLICA_SERVERS: Annotated[
+        list[str] | str, BeforeValidator(parse_cors)
+    ] = []
+    POSTGRES_REPLICA_USER: str | None = None
+    POSTGRES_REPLICA_PASSWORD: str | None = None
+    # a replica failing or lagging more than this is skipped for
+    # POSTGRES_REPLICA_RETRY_SECONDS
+    POSTGRES_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    POSTGRES_REPLICA_RETRY_SECONDS: float = 30.0
+    # how often the lag of each replica is checked
+    POSTGRES_REPLICA_CHECK_SECONDS: float = 5.0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_REPLICA_URIS(self) -> list[PostgresDsn]:
+        uris = []
+        for server in self.POSTGRES_REPLICA_SERVERS:
+            host, _, port = server.strip().partition(":")
+            if not host:
+                continue
+            uris.append(
+                MultiHostUrl.build(
+                    scheme="postgresql+psycopg",
+                    username=self.POSTGRES_REPLICA_USER or self.POSTGRES_USER,
+                    password=self.POSTGRES_REPLICA_PASSWORD or self.POSTGRES_PASSWORD,
+                    host=host,
+                    port=int(port) if port else self.POSTGRES_PORT,
+                    path=self.POSTGRES_DB,
+                )
+            )
+        return uris
+
+    # "pgbouncer" when connecting through PgBouncer in transaction pooling
+    # mode, see app/core/pool.py
+    DB_POOL_MODE: Literal["direct", "pgbouncer"] = "direct"
+    # per engine and worker process, so `fastapi run --workers 4` can open up
+    # to 4 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections with each engine
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # how long a request waits for a free connection before failing
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # reopen connections older than this, -1 to keep them forever
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # test each connection when it's checked out, drops the ones the server
+    # or a proxy closed in the meantime
+    DB_POOL_PRE_PING: bool = True
+    # server side limit for every statement, 0 for none
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+
+    # serve items, restaurants, books and payments from the async route
+    # modules, on the async engine (app/api/async_routes)
+    ASYNC_DB: bool = False
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -84,6 +140,29 @@ class Settings(BaseSettings):
     EFIPAY_CLIENT_SECRET: str
     EFIPAY_CERTIFICATE_PATH: str
     EFIPAY_EVP_KEY: str
+    EFIPAY_SANDBOX: bool = False
+    # overrides the production/sandbox URL, e.g. to point to a fake PSP
+    EFIPAY_BASE_URL: str | None = None
+    EFIPAY_TIMEOUT_SECONDS: float = 10.0
+    # also the size of the connection pool to the PSP
+    EFIPAY_MAX_CONCURRENCY: int = 20
+    # how long an active charge read from the PSP is reused, paid, removed
+    # and expired charges are cached for good
+    EFIPAY_CHARGE_CACHE_TTL_SECONDS: float = 5.0
+    # registered with the webhook URL as ?hmac=..., so notifications that
+    # didn't come from the PSP are refused. Outside of local the webhook
+    # refuses everything until it's set
+    EFIPAY_WEBHOOK_HMAC: str | None = None
+
+    # pending payments are checked against the PSP in the background, by
+    # `python -m app.reconcile` (the reconciler service of docker-compose.yml)
+    # or, when set, by each API worker
+    PAYMENT_RECONCILE_IN_APP: bool = False
+    PAYMENT_RECONCILE_INTERVAL_SECONDS: float = 60.0
+    PAYMENT_RECONCILE_BATCH_SIZE: int = 500
+    PAYMENT_RECONCILE_CONCURRENCY: int = 10
+    # how long a response is replayed for retries with the same Idempotency-Key
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 24 * 60 * 60
 
     @model_validator(mode="after")
     def _set_default_emails_from(self) -> Self:
@@ -93,6 +172,23 @@ class Settings(BaseSettings):
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
 
+    # authenticated users are cached per worker, other workers only see a
+    # deactivation once their copy expires
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAX_ENTRIES: int = 10_000
+
+    # verified access tokens remembered per worker, until they expire
+    TOKEN_CACHE_MAX_ENTRIES: int = 10_000
+
+    # threads hashing passwords and how many more hashes may wait for one,
+    # requests past that get a 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUED: int = 16
+
+    # how long shared caches may serve restaurants and menus without
+    # revalidating them
+    HTTP_CACHE_MAX_AGE_SECONDS: int = 60
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def emails_enabled(self) -> bool:
@@ -1,10 +1,27 @@
+import json
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import ClauseElement, Executable, orm
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.pool import engine_options, instrument, pool_metrics
 from app.models import * # noqa
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI), **engine_options(pool_metrics["primary"])
+)
+instrument(engine, pool_metrics["primary"])
+# same database through psycopg's async driver, for the async routes
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    **engine_options(pool_metrics["async"], is_async=True),
+)
+instrument(async_engine.sync_engine, pool_metrics["async"])
 
 def init_db(session: Session) -> None:
     user = session.exec(
@@ -18,3 +35,31 @@ def init_db(session: Session) -> None:
             cpf="12345678909",
         )
         user = crud.create_user(session=session, user_create=user_in)
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Any) -> None:
+        self.statement = statement
+
+
+# the same decorator, typed (SQLAlchemy's isn't)
+_compiles: Callable[
+    [type[ClauseElement]], Callable[[Callable[..., str]], Callable[..., str]]
+] = compiles
+
+
+@_compiles(Explain)
+def _compile_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+def explain(session: orm.Session, statement: Any) -> dict[str, Any]:
+    """
+    Planner output for the statement, without running it.
+    """
+    plan = session.execute(Explain(statement)).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]  # type: ignore[no-any-return]
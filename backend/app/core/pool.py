@@ -0,0 +1,162 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Connection, Engine, event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from app.core.config import settings
+
+# upper bounds of the checkout wait histogram, in seconds
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """
+    Counters of one connection pool, per worker process.
+
+    Checkout wait is the time spent getting a connection from the pool,
+    which only grows past a millisecond or so when every connection is in use
+    and requests queue for one.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self.engine: Engine | None = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {"name": self.name}
+        pool = self.engine.pool if self.engine is not None else None
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+            )
+        with self._lock:
+            bounds = [str(bound) for bound in WAIT_BUCKETS] + ["+Inf"]
+            stats.update(
+                checkouts=self.checkouts,
+                timeouts=self.timeouts,
+                connects=self.connects,
+                invalidations=self.invalidations,
+                wait_seconds_total=self.wait_seconds_total,
+                wait_seconds_max=self.wait_seconds_max,
+                wait_seconds_buckets=dict(zip(bounds, self.wait_buckets, strict=True)),
+            )
+        return stats
+
+
+class _TimedCheckout:
+    # set on the subclasses made by `timed_pool`, a class attribute survives
+    # the pool being recreated by `engine.dispose()`
+    metrics: PoolMetrics
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()  # type: ignore[misc]
+        except TimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        self.metrics.observe_wait(time.perf_counter() - start)
+        return connection
+
+
+def timed_pool(pool_class: type[QueuePool], metrics: PoolMetrics) -> type[QueuePool]:
+    return type(
+        f"Timed{pool_class.__name__}",
+        (_TimedCheckout, pool_class),
+        {"metrics": metrics},
+    )
+
+
+def engine_options(metrics: PoolMetrics, *, is_async: bool = False) -> dict[str, Any]:
+    """
+    Keyword arguments for `create_engine`/`create_async_engine` with the pool
+    configured from the settings and instrumented into `metrics`.
+
+    With DB_POOL_MODE=pgbouncer consecutive transactions may run on different
+    server connections, so nothing can be kept on them: psycopg doesn't
+    prepare statements and no startup options are sent (the statement
+    timeout is set per transaction by `instrument`). DB_POOL_SIZE=0 then
+    leaves pooling to PgBouncer entirely.
+    """
+    connect_args: dict[str, Any] = {}
+    if settings.DB_POOL_MODE == "pgbouncer":
+        connect_args["prepare_threshold"] = None
+        if not settings.DB_POOL_SIZE:
+            return {"poolclass": NullPool, "connect_args": connect_args}
+    elif settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = (
+            f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+        )
+    pool_class = AsyncAdaptedQueuePool if is_async else QueuePool
+    return {
+        "poolclass": timed_pool(pool_class, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def instrument(engine: Engine, metrics: PoolMetrics) -> None:
+    """
+    Count the connections `engine` opens and throws away.
+    """
+    metrics.engine = engine
+
+    @event.listens_for(engine, "connect")
+    def _connect(*_args: Any) -> None:
+        metrics.connects += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(*_args: Any) -> None:
+        metrics.invalidations += 1
+
+    if settings.DB_POOL_MODE == "pgbouncer" and settings.DB_STATEMENT_TIMEOUT_MS:
+
+        @event.listens_for(engine, "begin")
+        def _statement_timeout(connection: Connection) -> None:
+            # on the driver's connection, going through `connection` would
+            # begin the transaction again
+            cursor = connection.connection.cursor()
+            cursor.execute(
+                f"SET LOCAL statement_timeout = {settings.DB_STATEMENT_TIMEOUT_MS}"
+            )
+            cursor.close()
+
+
+pool_metrics: dict[str, PoolMetrics] = {
+    "primary": PoolMetrics("primary"),
+    "async": PoolMetrics("async"),
+}
@@ -0,0 +1,125 @@
+import itertools
+import logging
+import threading
+import time
+from functools import partial
+
+from sqlalchemy import Connection, Engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.pool import PoolMetrics, engine_options, instrument, pool_metrics
+
+logger = logging.getLogger(__name__)
+
+# seconds the replica is behind, 0 when it has replayed all it received
+# (an idle primary sends nothing, so the last replay time would look old)
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine, async_engine: AsyncEngine) -> None:
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.down_until = 0.0
+        self.checked_at = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, reason: str) -> None:
+        logger.warning("Replica %s skipped: %s", self.name, reason)
+        self.down_until = time.monotonic() + settings.POSTGRES_REPLICA_RETRY_SECONDS
+
+    def check_due(self) -> bool:
+        now = time.monotonic()
+        if now - self.checked_at < settings.POSTGRES_REPLICA_CHECK_SECONDS:
+            return False
+        self.checked_at = now
+        return True
+
+    def check_lag(self, lag: float | None) -> bool:
+        if lag is not None and lag > settings.POSTGRES_REPLICA_MAX_LAG_SECONDS:
+            self.mark_down(f"{lag:.1f}s behind")
+            return False
+        return True
+
+
+class ReplicaSet:
+    """
+    Read replicas taken in turn, skipping the ones that can't be reached or
+    lag too much, and the primary when none is left.
+
+    Sessions come with their connection already checked out (and pinged,
+    DB_POOL_PRE_PING), so a dead replica is noticed before the handler runs
+    rather than in the middle of it.
+    """
+
+    def __init__(self, replicas: list[Replica]) -> None:
+        self.replicas = replicas
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def _candidates(self) -> list[Replica]:
+        if not self.replicas:
+            return []
+        with self._lock:
+            start = next(self._turn) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in ordered if replica.available]
+
+    def _check(self, replica: Replica, connection: Connection) -> bool:
+        if not replica.check_due():
+            return True
+        return replica.check_lag(connection.execute(LAG_QUERY).scalar())
+
+    def session(self) -> Session:
+        for replica in self._candidates():
+            session = Session(replica.engine)
+            try:
+                if self._check(replica, session.connection()):
+                    return session
+            except DBAPIError as e:
+                replica.mark_down(str(e.orig))
+            session.close()
+        return Session(engine)
+
+    async def async_session(self) -> AsyncSession:
+        for replica in self._candidates():
+            session = AsyncSession(replica.async_engine, expire_on_commit=False)
+            try:
+                connection = await session.connection()
+                if await connection.run_sync(partial(self._check, replica)):
+                    return session
+            except DBAPIError as e:
+                replica.mark_down(str(e.orig))
+            await session.close()
+        return AsyncSession(async_engine, expire_on_commit=False)
+
+
+def _replica(index: int, uri: str) -> Replica:
+    name = f"replica-{index}"
+    metrics = pool_metrics[name] = PoolMetrics(name)
+    async_metrics = pool_metrics[f"{name}-async"] = PoolMetrics(f"{name}-async")
+    replica_engine = create_engine(uri, **engine_options(metrics))
+    instrument(replica_engine, metrics)
+    replica_async_engine = create_async_engine(
+        uri, **engine_options(async_metrics, is_async=True)
+    )
+    instrument(replica_async_engine.sync_engine, async_metrics)
+    return Replica(name, replica_engine, replica_async_engine)
+
+
+replicas = ReplicaSet(
+    [_replica(i, str(uri)) for i, uri in enumerate(settings.SQLALCHEMY_REPLICA_URIS)]
+)
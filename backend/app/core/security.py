@@ -1,5 +1,12 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, TypeVar
 
 import jwt
 from passlib.context import CryptContext
@@ -8,6 +15,8 @@ from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
 
 ALGORITHM = "HS256"
 
@@ -19,9 +28,97 @@ def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     return encoded_jwt
 
 
+class PasswordHasherBusy(Exception):
+    """
+    Too many passwords are being hashed already, the request should be retried
+    later.
+    """
+
+
+class PasswordHasher:
+    """
+    Runs the bcrypt hashing on its own `workers` threads (bcrypt releases the
+    GIL), with at most `max_queued` more calls waiting for one.
+
+    A login burst then ties up at most `workers + max_queued` request threads,
+    past that calls fail right away with `PasswordHasherBusy` and the rest of
+    the thread pool stays free for the other endpoints.
+    """
+
+    def __init__(self, workers: int, max_queued: int) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+
+    def run(self, function: Callable[..., T], *args: Any) -> T:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queued=settings.PASSWORD_HASH_MAX_QUEUED,
+)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return bool(
+        password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+    )
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return str(password_hasher.run(pwd_context.hash, password))
+
+
+class TokenCache:
+    """
+    Users of the access tokens already verified, by token hash, until the
+    token expires, so the same token sent again skips the signature check and
+    the claims validation.
+
+    Least recently used entries are dropped past `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        # token hash -> (expires at, user id)
+        self._entries: OrderedDict[bytes, tuple[float, uuid.UUID]] = OrderedDict()
+        # dependencies of sync handlers run in the thread pool
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> uuid.UUID | None:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, token: str, user_id: uuid.UUID, expires_at: float) -> None:
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, user_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES)
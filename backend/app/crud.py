@@ -1,20 +1,56 @@
 import uuid
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy import null
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlmodel import col, delete, select, update
 
 from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
+from app.models import (
+    Book,
+    IdempotencyKey,
+    Item,
+    ItemCreate,
+    Payment,
+    PaymentUpdate,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+from app.principal import principal_cache
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
+    """
+    Insert the user in a single round trip, relying on the unique indexes to
+    reject a taken email or CPF (see `duplicate_user_field`).
+    """
     db_obj = User.model_validate(
         user_create, update={"hashed_password": get_password_hash(user_create.password)}
     )
-    session.add(db_obj)
+    statement = insert(User).values(**db_obj.model_dump()).returning(User)
+    try:
+        user = session.scalars(statement).one()
+    except IntegrityError:
+        session.rollback()
+        raise
+    # kept out of the commit's expiry, it already holds every column and
+    # would otherwise be read again on first use
+    session.expunge(user)
     session.commit()
-    session.refresh(db_obj)
-    return db_obj
+    return user
+
+
+def duplicate_user_field(error: IntegrityError) -> str | None:
+    """
+    "email" or "cpf" when the error is the user's email or CPF being taken.
+    """
+    constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+    return {"ix_user_email": "email", "ix_user_cpf": "cpf"}.get(str(constraint))
 
 
 def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
@@ -27,19 +63,20 @@ def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
     session.commit()
+    principal_cache.invalidate(db_user.id)
     session.refresh(db_user)
     return db_user
 
 
 def get_user_by_email(*, session: Session, email: str) -> User | None:
     statement = select(User).where(User.email == email)
-    session_user = session.exec(statement).first()
+    session_user = session.scalars(statement).first()
     return session_user
 
 
 def get_user_by_cpf(*, session: Session, cpf: str) -> User | None:
     statement = select(User).where(User.cpf == cpf)
-    session_user = session.exec(statement).first()
+    session_user = session.scalars(statement).first()
     return session_user
 
 
@@ -58,3 +95,185 @@ def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -
     session.commit()
     session.refresh(db_item)
     return db_item
+
+
+# Allowed payment status changes, paid and cancelled are final. A failed
+# lookup at the PSP may be transient, so failed can still be settled.
+PAYMENT_TRANSITIONS: dict[str, set[str]] = {
+    "pending": {"paid", "cancelled", "failed"},
+    "failed": {"paid", "cancelled"},
+}
+
+
+def transition_payments(
+    *, session: Session, payment_ids: Sequence[uuid.UUID], status: str
+) -> list[uuid.UUID]:
+    """
+    Move the payments to `status` where the transition is allowed, activating
+    the books of the ones being paid, all in one transaction. This is the only
+    place payment status changes, so it happens exactly once per payment no
+    matter who notices it first.
+
+    Returns the ids of the payments that actually changed.
+    """
+    changed = _transition_payments(
+        session=session, payment_ids=payment_ids, status=status
+    )
+    session.commit()
+    return changed
+
+
+def _transition_payments(
+    *, session: Session, payment_ids: Sequence[uuid.UUID], status: str
+) -> list[uuid.UUID]:
+    sources = [
+        source for source, targets in PAYMENT_TRANSITIONS.items() if status in targets
+    ]
+    if not payment_ids or not sources:
+        return []
+    statement = (
+        update(Payment)
+        .where(col(Payment.id).in_(payment_ids), col(Payment.status).in_(sources))
+        .values(status=status)
+        .returning(col(Payment.id), col(Payment.book_id))
+    )
+    changed = session.execute(statement).all()
+    if status == "paid" and changed:
+        activate = (
+            update(Book)
+            .where(col(Book.id).in_([book_id for _, book_id in changed]))
+            .values(active=True)
+        )
+        session.execute(activate)
+    return [payment_id for payment_id, _ in changed]
+
+
+def pay_charges(*, session: Session, charges: Mapping[str, int]) -> list[uuid.UUID]:
+    """
+    Settle the payments of the PIX charges (txid -> amount received, in
+    cents) that were paid at least their value, in one transaction.
+
+    Safe to call again with the same charges, already paid payments are left
+    alone. Returns the ids of the payments that were paid now.
+    """
+    if not charges:
+        return []
+    statement = select(Payment.id, Payment.token, Payment.value).where(
+        col(Payment.token).in_(list(charges))
+    )
+    payment_ids = [
+        payment_id
+        for payment_id, token, value in session.execute(statement)
+        if token is not None and charges[token] >= value
+    ]
+    return transition_payments(session=session, payment_ids=payment_ids, status="paid")
+
+
+def transition_payment(*, session: Session, payment: Payment, status: str) -> bool:
+    changed = transition_payments(
+        session=session, payment_ids=[payment.id], status=status
+    )
+    session.refresh(payment)
+    return bool(changed)
+
+
+def update_payment(
+    *, session: Session, payment: Payment, payment_in: PaymentUpdate
+) -> bool:
+    """
+    Apply the update to the payment, its status going through the allowed
+    transitions, in one transaction.
+
+    Returns False, with nothing written, if the status change isn't allowed.
+    """
+    update_dict = payment_in.model_dump(exclude_unset=True)
+    status = update_dict.pop("status", payment.status)
+    moves = status != payment.status
+    if moves and status not in PAYMENT_TRANSITIONS.get(payment.status, set()):
+        return False
+    payment.sqlmodel_update(update_dict)
+    session.add(payment)
+    # the status may have moved since the payment was read, checked again here
+    if moves and not _transition_payments(
+        session=session, payment_ids=[payment.id], status=status
+    ):
+        session.rollback()
+        return False
+    session.commit()
+    session.refresh(payment)
+    return True
+
+
+def claim_idempotency_key(
+    *, session: Session, owner_id: uuid.UUID, key: str, request_hash: str, ttl: int
+) -> IdempotencyKey | None:
+    """
+    Reserve the key for a new request, taking it over if it expired.
+
+    Returns None when the caller got the key and must process the request,
+    otherwise the record of the request that holds it.
+    """
+    now = datetime.utcnow()
+    statement = (
+        insert(IdempotencyKey)
+        .values(
+            owner_id=owner_id,
+            key=key,
+            request_hash=request_hash,
+            expires_at=now + timedelta(seconds=ttl),
+        )
+        .on_conflict_do_update(
+            index_elements=["owner_id", "key"],
+            set_={
+                "request_hash": request_hash,
+                # JSON null otherwise, which isn't IS NULL
+                "response": null(),
+                "expires_at": now + timedelta(seconds=ttl),
+            },
+            where=col(IdempotencyKey.expires_at) <= now,
+        )
+        .returning(col(IdempotencyKey.key))
+    )
+    while True:
+        claimed = session.execute(statement).first()
+        session.commit()
+        if claimed is not None:
+            return None
+        held = session.get(IdempotencyKey, (owner_id, key), populate_existing=True)
+        if held is not None:
+            return held
+        # released or swept since the insert saw it, free to claim again
+
+
+def save_idempotent_response(
+    *, session: Session, owner_id: uuid.UUID, key: str, response: dict[str, Any]
+) -> None:
+    statement = (
+        update(IdempotencyKey)
+        .where(col(IdempotencyKey.owner_id) == owner_id, col(IdempotencyKey.key) == key)
+        .values(response=response)
+    )
+    session.execute(statement)
+    session.commit()
+
+
+def release_idempotency_key(*, session: Session, owner_id: uuid.UUID, key: str) -> None:
+    """
+    Give up a claimed key whose request failed, so it can be retried.
+    """
+    statement = delete(IdempotencyKey).where(
+        col(IdempotencyKey.owner_id) == owner_id,
+        col(IdempotencyKey.key) == key,
+        col(IdempotencyKey.response).is_(None),
+    )
+    session.execute(statement)
+    session.commit()
+
+
+def delete_expired_idempotency_keys(*, session: Session) -> int:
+    statement = delete(IdempotencyKey).where(
+        col(IdempotencyKey.expires_at) <= datetime.utcnow()
+    )
+    result = session.execute(statement)
+    session.commit()
+    return int(result.rowcount)
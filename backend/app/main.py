@@ -1,10 +1,18 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
+from app import payment, reconcile
 from app.api.main import api_router
+from app.api.responses import ORJSONResponse
 from app.core.config import settings
+from app.core.security import PasswordHasherBusy
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,12 +22,38 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    reconciler = None
+    if settings.PAYMENT_RECONCILE_IN_APP:
+        reconciler = asyncio.create_task(reconcile.run())
+    yield
+    if reconciler is not None:
+        reconciler.cancel()
+        with suppress(asyncio.CancelledError):
+            await reconciler
+    await payment.close_client()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(_: Request, __: PasswordHasherBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many requests being authenticated, try again"},
+        headers={"Retry-After": "1"},
+    )
+
+
 # Set all CORS enabled origins
 # if settings.all_cors_origins:
 #     app.add_middleware(
@@ -1,12 +1,30 @@
 from datetime import datetime, time
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 import uuid
 
 from pydantic import EmailStr
+from sqlalchemy import Column, Computed, Index, Integer, func, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlmodel import Field, Relationship, SQLModel
 from pydantic_br import CPFDigits
 
+
+def updated_at_field() -> datetime:
+    """
+    Time of the last write to the row, by the ORM (also for bulk updates)
+    or the database default for rows inserted in SQL. Validator of the
+    conditional GETs (app/api/conditional.py).
+    """
+    return Field(  # type: ignore[no-any-return]
+        default_factory=datetime.utcnow,
+        sa_column_kwargs={
+            "server_default": text("timezone('utc', now())"),
+            "onupdate": datetime.utcnow,
+        },
+    )
+
+
 class WeekEnum(str, Enum):
     Monday = "monday"
     Tuesday = "tuesday"
@@ -19,7 +37,7 @@ class WeekEnum(str, Enum):
 # Shared properties
 class UserBase(SQLModel):
     email: EmailStr = Field(unique=True, index=True, max_length=255)
-    cpf: str
+    cpf: str = Field(unique=True, index=True)
     is_active: bool = True
     is_superuser: bool = False
     full_name: str | None = Field(default=None, max_length=255)
@@ -76,7 +94,9 @@ class UserMe(UserPublic):
 
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    count: int | None
+    has_more: bool = False
+    next_cursor: str | None = None
 
 class RestaurantBase(SQLModel):
     name: str = Field(min_length=1, max_length=255)
@@ -98,11 +118,51 @@ class Restaurant(RestaurantBase, table=True):
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
+    updated_at: datetime = updated_at_field()
     owner: User | None = Relationship(back_populates="restaurants")
     items: list["Item"] = Relationship(back_populates="restaurant", cascade_delete=True)
     books: list["Book"] = Relationship(back_populates="restaurant", cascade_delete=True)
     operating_date_times: list["OperatingDateTime"] = Relationship(back_populates="restaurant", cascade_delete=True)
 
+# Full-text search document, weighted name (A) > description (B) > address (C).
+# Postgres keeps it up to date as a generated column; it's appended to the table
+# instead of declared as a field so the ORM never selects or writes it.
+RESTAURANT_SEARCH_CONFIG = "portuguese"
+restaurant_search_vector = Column(
+    "search_vector",
+    TSVECTOR,
+    Computed(
+        f"setweight(to_tsvector('{RESTAURANT_SEARCH_CONFIG}'::regconfig, coalesce(name, '')), 'A') || "
+        f"setweight(to_tsvector('{RESTAURANT_SEARCH_CONFIG}'::regconfig, coalesce(description, '')), 'B') || "
+        f"setweight(to_tsvector('{RESTAURANT_SEARCH_CONFIG}'::regconfig, coalesce(address, '')), 'C')",
+        persisted=True,
+    ),
+)
+Restaurant.__table__.append_column(restaurant_search_vector)  # type: ignore[attr-defined]
+Index("ix_restaurant_search_vector", restaurant_search_vector, postgresql_using="gin")
+
+# owner for the cascades from user, name for the listing order
+Index("ix_restaurant_owner_id", Restaurant.owner_id)  # type: ignore[arg-type]
+Index(
+    "ix_restaurant_name_id",
+    Restaurant.name,
+    Restaurant.id,  # type: ignore[arg-type]
+)
+# fuzzy search (app/search.py), f_unaccent is created by their migration
+# 7d3f5a0e8c21, declared here so autogenerate doesn't drop them
+Index(
+    "ix_restaurant_name_trgm",
+    func.f_unaccent(func.lower(Restaurant.name)).label("name_trgm"),
+    postgresql_using="gin",
+    postgresql_ops={"name_trgm": "gin_trgm_ops"},
+)
+Index(
+    "ix_restaurant_address_trgm",
+    func.f_unaccent(func.lower(Restaurant.address)).label("address_trgm"),
+    postgresql_using="gin",
+    postgresql_ops={"address_trgm": "gin_trgm_ops"},
+)
+
 class RestaurantPublic(RestaurantBase):
     id: uuid.UUID
     owner_id: uuid.UUID
@@ -115,7 +175,9 @@ class RestaurantFull(RestaurantPublic):
 
 class RestaurantsPublic(SQLModel):
     data: list[RestaurantPublic]
-    count: int
+    count: int | None
+    has_more: bool = False
+    next_cursor: str | None = None
 
 class OperatingDateTimeBase(SQLModel):
     restaurant_id: uuid.UUID
@@ -136,8 +198,44 @@ class OperatingDateTime(OperatingDateTimeBase, table=True):
     restaurant_id: uuid.UUID = Field(
         foreign_key="restaurant.id", nullable=False, ondelete="CASCADE"
     )
+    updated_at: datetime = updated_at_field()
     restaurant: Restaurant | None = Relationship(back_populates="operating_date_times")
 
+# Opening interval in minutes of the week (monday 00:00 is 0), generated by
+# Postgres from the day and times. Closing at or before the opening time means
+# closing on the next day, so close_minute can go past the end of the week.
+def _minutes(column: str) -> str:
+    return f"(split_part({column}::text, ':', 1)::int * 60 + split_part({column}::text, ':', 2)::int)"
+
+_WEEK_DAY = (
+    "(CASE lower(day_of_week::text) "
+    + " ".join(f"WHEN '{day.value}' THEN {index}" for index, day in enumerate(WeekEnum))
+    + " END)"
+)
+operating_open_minute = Column(
+    "open_minute",
+    Integer,
+    Computed(f"{_WEEK_DAY} * 1440 + {_minutes('open_time')}", persisted=True),
+)
+operating_close_minute = Column(
+    "close_minute",
+    Integer,
+    Computed(
+        f"{_WEEK_DAY} * 1440 + {_minutes('close_time')} + "
+        f"(CASE WHEN {_minutes('close_time')} <= {_minutes('open_time')} THEN 1440 ELSE 0 END)",
+        persisted=True,
+    ),
+)
+OperatingDateTime.__table__.append_column(operating_open_minute)  # type: ignore[attr-defined]
+OperatingDateTime.__table__.append_column(operating_close_minute)  # type: ignore[attr-defined]
+operating_week_range = func.int4range(operating_open_minute, operating_close_minute)
+Index(
+    "ix_operatingdatetime_restaurant_id_day_of_week",
+    OperatingDateTime.restaurant_id,  # type: ignore[arg-type]
+    OperatingDateTime.day_of_week,
+)
+Index("ix_operatingdatetime_week_range", operating_week_range, postgresql_using="gist")
+
 # Shared properties
 class ItemBase(SQLModel):
     restaurant_id: uuid.UUID
@@ -167,10 +265,21 @@ class Item(ItemBase, table=True):
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
+    updated_at: datetime = updated_at_field()
     owner: User | None = Relationship(back_populates="items")
     restaurant: Restaurant | None = Relationship(back_populates="items")
 
 
+# the lists of a user's items in their order, and the cascades from restaurant
+Index(
+    "ix_item_owner_id_title",
+    Item.owner_id,  # type: ignore[arg-type]
+    Item.title,
+    Item.id,  # type: ignore[arg-type]
+)
+Index("ix_item_restaurant_id", Item.restaurant_id)  # type: ignore[arg-type]
+
+
 # Properties to return via API, id is always required
 class ItemPublic(ItemBase):
     id: uuid.UUID
@@ -179,7 +288,9 @@ class ItemPublic(ItemBase):
 
 class ItemsPublic(SQLModel):
     data: list[ItemPublic]
-    count: int
+    count: int | None
+    has_more: bool = False
+    next_cursor: str | None = None
     
 class BookBase(SQLModel):
     restaurant_id: uuid.UUID
@@ -202,10 +313,24 @@ class Book(BookBase, table=True):
     )
     active: bool = Field(default=False)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = updated_at_field()
     user: User | None = Relationship(back_populates="books")
     restaurant: Restaurant | None = Relationship(back_populates="books")
     payments: list["Payment"] = Relationship(back_populates="book", cascade_delete=True)
 
+Index(
+    "ix_book_owner_id_created_at",
+    Book.owner_id,  # type: ignore[arg-type]
+    Book.created_at,  # type: ignore[arg-type]
+    Book.id,  # type: ignore[arg-type]
+)
+Index(
+    "ix_book_restaurant_id_created_at",
+    Book.restaurant_id,  # type: ignore[arg-type]
+    Book.created_at,  # type: ignore[arg-type]
+    Book.id,  # type: ignore[arg-type]
+)
+
 class BookPublic(BookBase):
     id: uuid.UUID
     owner_id: uuid.UUID
@@ -214,7 +339,9 @@ class BookPublic(BookBase):
 
 class BooksPublic(SQLModel):
     data: list[BookPublic]
-    count: int
+    count: int | None
+    has_more: bool = False
+    next_cursor: str | None = None
     
 class PaymentBase(SQLModel):
     book_id: uuid.UUID
@@ -242,6 +369,18 @@ class Payment(PaymentBase, table=True):
     book: Book | None = Relationship(back_populates="payments")
     user: User | None = Relationship(back_populates="payments")
 
+Index(
+    "ix_payment_book_id_status",
+    Payment.book_id,  # type: ignore[arg-type]
+    Payment.status,
+)
+Index(
+    "ix_payment_owner_id_created_at",
+    Payment.owner_id,  # type: ignore[arg-type]
+    Payment.created_at,  # type: ignore[arg-type]
+    Payment.id,  # type: ignore[arg-type]
+)
+
 class Calendario(SQLModel):
     criacao: datetime
     expiracao: int
@@ -271,6 +410,19 @@ class Charge(SQLModel):
     solicitacaoPagador: Optional[str] = None
     pixCopiaECola: Optional[str] = None
 
+# PIX notifications pushed by the PSP to the webhook
+class PixNotification(SQLModel):
+    endToEndId: str
+    txid: str | None = None
+    chave: str | None = None
+    valor: str
+    horario: datetime | None = None
+    infoPagador: str | None = None
+
+class PixWebhook(SQLModel):
+    # empty when the PSP checks the URL while registering it
+    pix: list[PixNotification] = []
+
 class PaymentPublic(PaymentBase):
     id: uuid.UUID
     value: int
@@ -282,8 +434,37 @@ class PaymentCharge(PaymentPublic):
 
 class PaymentsPublic(SQLModel):
     data: list[PaymentPublic]
-    count: int
+    count: int | None
+    has_more: bool = False
+    next_cursor: str | None = None
     
+# Response of a request sent with an Idempotency-Key, replayed on retries
+class IdempotencyKey(SQLModel, table=True):
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    key: str = Field(primary_key=True, max_length=255)
+    # hash of the request body, the key can't be reused for another request
+    request_hash: str = Field(max_length=64)
+    # None (SQL NULL) while the first request is still being processed
+    response: dict[str, Any] | None = Field(default=None, sa_type=JSONB)
+    expires_at: datetime = Field(index=True)
+
+# Connection pool counters, see app/core/pool.py
+class PoolStats(SQLModel):
+    name: str
+    size: int | None = None
+    checked_in: int | None = None
+    checked_out: int | None = None
+    overflow: int | None = None
+    checkouts: int
+    timeouts: int
+    connects: int
+    invalidations: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    wait_seconds_buckets: dict[str, int]
+
 # Generic message
 class Message(SQLModel):
     message: str
@@ -1,36 +1,330 @@
-from efipay import EfiPay
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable, Collection
+from datetime import datetime, timedelta
+from typing import Any
+
+import anyio.from_thread
+import httpx
+
 from app.core.config import settings
+from app.models import Charge
 
-CREDENTIALS = {
-    'client_id': settings.EFIPAY_CLIENT_ID,
-    'client_secret': settings.EFIPAY_CLIENT_SECRET,
-    # 'sandbox': settings.ENVIRONMENT == "production",
-    'sandbox': False,
-    'certificate': settings.EFIPAY_CERTIFICATE_PATH
-}
-
-efi = EfiPay(CREDENTIALS)
-
-def create_immediate_charge(expiration: int, cpf: str, name: str, value: int, key: str, description: str):
-    cal_value: float = float(value) / 100.0
-    body = {
-        'calendario': {
-            'expiracao': expiration
-        },
-        'devedor': {
-            'cpf': cpf,
-            'nome': name
-        },
-        'valor': {
-            'original': str(f"{cal_value:.2f}")
-        },
-        'chave': key,
-        'solicitacaoPagador': description
-    }
-    return efi.pix_create_immediate_charge(body=body)
+PRODUCTION_URL = "https://pix.api.efipay.com.br"
+SANDBOX_URL = "https://pix-h.api.efipay.com.br"
+
+# renew the access token a bit before the PSP expires it
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+
+class PixError(Exception):
+    """
+    The PSP could not be reached or answered with an error.
+    """
+
+
+class PixClient:
+    """
+    Async EfiPay PIX API client.
+
+    Connections are kept alive (HTTP/2 when the PSP allows it) and shared by
+    every request of the worker, the mTLS certificate is loaded once when the
+    client is built and the OAuth token is reused until it expires. Every call
+    has a timeout and at most `max_concurrency` run at the same time, so a slow
+    PSP can't pile up requests.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        certificate: str | None = None,
+        timeout: float = 10.0,
+        max_concurrency: int = 20,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            cert=certificate,
+            http2=True,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            transport=transport,
+        )
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+        self._token: str | None = None
+        self._token_expires_at = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "PixClient":
+        base_url = settings.EFIPAY_BASE_URL or (
+            SANDBOX_URL if settings.EFIPAY_SANDBOX else PRODUCTION_URL
+        )
+        return cls(
+            base_url=base_url,
+            client_id=settings.EFIPAY_CLIENT_ID,
+            client_secret=settings.EFIPAY_CLIENT_SECRET,
+            certificate=settings.EFIPAY_CERTIFICATE_PATH or None,
+            timeout=settings.EFIPAY_TIMEOUT_SECONDS,
+            max_concurrency=settings.EFIPAY_MAX_CONCURRENCY,
+        )
+
+    async def _access_token(self) -> str:
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            response = await self._send(
+                "POST",
+                "/oauth/token",
+                auth=(self.client_id, self.client_secret),
+                json={"grant_type": "client_credentials"},
+            )
+            if response.status_code != 200:
+                raise PixError(f"authentication failed: {response.status_code}")
+            data = response.json()
+            self._token = str(data["access_token"])
+            self._token_expires_at = (
+                time.monotonic()
+                + int(data.get("expires_in", 3600))
+                - TOKEN_EXPIRY_MARGIN_SECONDS
+            )
+            return self._token
+
+    async def _send(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        async with self._slots:
+            try:
+                return await self._http.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                raise PixError(str(e)) from e
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        token = await self._access_token()
+        response = await self._send(
+            method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs
+        )
+        if response.status_code == 401:
+            # revoked before its expiration, get a new one and try once more
+            self._token = None
+            token = await self._access_token()
+            response = await self._send(
+                method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs
+            )
+        if response.status_code >= 500:
+            raise PixError(f"{method} {url} failed: {response.status_code}")
+        return response
+
+    async def create_immediate_charge(
+        self,
+        expiration: int,
+        cpf: str,
+        name: str,
+        value: int,
+        key: str,
+        description: str,
+    ) -> dict[str, Any] | None:
+        cal_value: float = float(value) / 100.0
+        body = {
+            "calendario": {"expiracao": expiration},
+            "devedor": {"cpf": cpf, "nome": name},
+            "valor": {"original": str(f"{cal_value:.2f}")},
+            "chave": key,
+            "solicitacaoPagador": description,
+        }
+        response = await self._request("POST", "/v2/cob", json=body)
+        if response.status_code != 201:
+            return None
+        return response.json()  # type: ignore[no-any-return]
+
+    async def detail_charge(self, txid: str) -> dict[str, Any] | None:
+        """
+        The charge `txid`, or None if the PSP doesn't know it. Any other error
+        (rate limited, forbidden...) says nothing about the charge and raises.
+        """
+        response = await self._request("GET", f"/v2/cob/{txid}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise PixError(f"GET /v2/cob/{txid} failed: {response.status_code}")
+        return response.json()  # type: ignore[no-any-return]
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+_client: PixClient | None = None
+
+
+def get_client() -> PixClient:
+    global _client
+    if _client is None:
+        _client = PixClient.from_settings()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class ChargeCache:
+    """
+    PIX charges read from the PSP, by txid, so polling a payment doesn't
+    call the PSP every time.
+
+    A paid or removed charge can't change anymore and is kept for good, as is
+    an active one past its expiration, which is worked out locally from
+    `calendario`. Other active charges are reused for `ttl` seconds. Concurrent
+    reads of the same charge share a single call to the PSP.
 
-def detail_charge(txid: str):
-    params = {
-        'txid': txid
+    `get` runs on the event loop, the calls in flight are only touched there.
+    The entries are behind a lock, `invalidate` and `clear` may be called
+    from any thread.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10_000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # txid -> (fetched at, charge or None if the PSP doesn't know it)
+        self._entries: dict[str, tuple[float, dict[str, Any] | None]] = {}
+        self._pending: dict[str, asyncio.Task[dict[str, Any] | None]] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry: tuple[float, dict[str, Any] | None]) -> bool:
+        fetched_at, charge_data = entry
+        if (
+            charge_data is not None
+            and charge_status(Charge(**charge_data)) != "pending"
+        ):
+            return True
+        return time.monotonic() - fetched_at < self.ttl
+
+    def _store(self, txid: str, charge_data: dict[str, Any] | None) -> None:
+        with self._lock:
+            self._entries.pop(txid, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)), None)
+            self._entries[txid] = (time.monotonic(), charge_data)
+
+    def put(self, charge_data: dict[str, Any]) -> None:
+        self._store(str(charge_data["txid"]), charge_data)
+
+    async def _fetch(
+        self,
+        txid: str,
+        fetch: Callable[[str], Awaitable[dict[str, Any] | None]],
+    ) -> dict[str, Any] | None:
+        try:
+            charge_data = await fetch(txid)
+            self._store(txid, charge_data)
+            return charge_data
+        finally:
+            del self._pending[txid]
+
+    async def get(
+        self,
+        txid: str,
+        fetch: Callable[[str], Awaitable[dict[str, Any] | None]],
+    ) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(txid)
+        if entry is not None and self._fresh(entry):
+            return entry[1]
+        task = self._pending.get(txid)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(txid, fetch))
+            self._pending[txid] = task
+        # a cancelled caller must not cancel the call the others wait on
+        return await asyncio.shield(task)
+
+    def invalidate(self, txid: str) -> None:
+        with self._lock:
+            self._entries.pop(txid, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+charge_cache = ChargeCache(ttl=settings.EFIPAY_CHARGE_CACHE_TTL_SECONDS)
+
+
+async def acreate_immediate_charge(
+    expiration: int, cpf: str, name: str, value: int, key: str, description: str
+) -> dict[str, Any] | None:
+    charge_data = await get_client().create_immediate_charge(
+        expiration, cpf, name, value, key, description
+    )
+    if charge_data:
+        # the first polls right after creating it get it from the cache
+        charge_cache.put(charge_data)
+    return charge_data
+
+
+async def adetail_charge(txid: str) -> dict[str, Any] | None:
+    return await charge_cache.get(txid, get_client().detail_charge)
+
+
+async def apaid_charges(txids: Collection[str]) -> set[str]:
+    """
+    The charges among `txids` the PSP reports as paid. They are read again
+    rather than cached, a notification has likely just changed them.
+    """
+    for txid in txids:
+        charge_cache.invalidate(txid)
+    charges = await asyncio.gather(*(adetail_charge(txid) for txid in txids))
+    return {
+        txid
+        for txid, charge_data in zip(txids, charges, strict=True)
+        if charge_data and charge_status(Charge(**charge_data)) == "paid"
     }
-    return efi.pix_detail_charge(params=params)
+
+
+# Blocking versions for the sync route handlers, they run the call on the
+# event loop (sharing its connections) and wait for it from the worker thread.
+
+
+def create_immediate_charge(
+    expiration: int, cpf: str, name: str, value: int, key: str, description: str
+) -> dict[str, Any] | None:
+    return anyio.from_thread.run(
+        acreate_immediate_charge, expiration, cpf, name, value, key, description
+    )
+
+
+def detail_charge(txid: str) -> dict[str, Any] | None:
+    return anyio.from_thread.run(adetail_charge, txid)
+
+
+def paid_charges(txids: Collection[str]) -> set[str]:
+    return anyio.from_thread.run(apaid_charges, txids)
+
+
+def charge_status(charge: Charge) -> str:
+    """
+    Payment status matching the state of a PIX charge.
+    """
+    match charge.status:
+        case "CONCLUIDA":
+            return "paid"
+        case "REMOVIDA_PELO_USUARIO_RECEBEDOR" | "REMOVIDA_PELO_PSP":
+            return "cancelled"
+    # an active charge past its expiration can't be paid anymore
+    if charge.status == "ATIVA" and charge.calendario is not None:
+        criacao = charge.calendario.criacao
+        expiracao = charge.calendario.expiracao
+        if criacao and expiracao:
+            now = datetime.now(criacao.tzinfo)
+            if now > criacao + timedelta(seconds=expiracao):
+                return "cancelled"
+    return "pending"
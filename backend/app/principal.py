@@ -0,0 +1,83 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.models import User
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """
+    What the route handlers need to know about the authenticated user.
+    """
+
+    id: uuid.UUID
+    is_active: bool
+    is_superuser: bool
+    cpf: str
+    full_name: str | None
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            cpf=user.cpf,
+            full_name=user.full_name,
+        )
+
+
+class PrincipalCache:
+    """
+    Principals of the recently authenticated users, so authenticating a
+    request doesn't read the user from the database every time.
+
+    Least recently used entries are dropped past `max_entries`. Changes to a
+    user must call `invalidate`, the TTL only bounds how long other workers
+    keep authenticating with a stale copy (e.g. of a deactivated user).
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10_000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # user id -> (expires at, principal)
+        self._entries: OrderedDict[uuid.UUID, tuple[float, UserPrincipal]] = (
+            OrderedDict()
+        )
+        # dependencies of sync handlers run in the thread pool
+        self._lock = threading.Lock()
+
+    def get(self, user_id: uuid.UUID) -> UserPrincipal | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, principal: UserPrincipal) -> None:
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.USER_CACHE_TTL_SECONDS, max_entries=settings.USER_CACHE_MAX_ENTRIES
+)
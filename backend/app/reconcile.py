@@ -0,0 +1,136 @@
+"""
+Reconcile pending payments with the state of their PIX charges.
+
+Runs as its own process:
+
+    python -m app.reconcile            # every PAYMENT_RECONCILE_INTERVAL_SECONDS
+    python -m app.reconcile --once
+
+or inside the API workers when PAYMENT_RECONCILE_IN_APP is set.
+"""
+
+import argparse
+import asyncio
+import logging
+import uuid
+from collections import Counter, defaultdict
+
+import anyio.to_thread
+from sqlmodel import Session, col, select
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Charge, Payment
+from app.payment import PixError, charge_cache, charge_status, close_client, get_client
+
+logger = logging.getLogger(__name__)
+
+
+def _pending_batch(after: uuid.UUID | None, limit: int) -> list[tuple[uuid.UUID, str]]:
+    statement = select(Payment.id, Payment.token).where(
+        Payment.status == "pending", col(Payment.token).is_not(None)
+    )
+    if after is not None:
+        statement = statement.where(Payment.id > after)
+    statement = statement.order_by(col(Payment.id)).limit(limit)
+    with Session(engine) as session:
+        return [
+            (payment_id, str(token)) for payment_id, token in session.exec(statement)
+        ]
+
+
+def _transition(changes: dict[str, list[uuid.UUID]]) -> Counter[str]:
+    changed: Counter[str] = Counter()
+    with Session(engine) as session:
+        for status, payment_ids in changes.items():
+            changed[status] += len(
+                crud.transition_payments(
+                    session=session, payment_ids=payment_ids, status=status
+                )
+            )
+    return changed
+
+
+def _delete_expired_idempotency_keys() -> int:
+    with Session(engine) as session:
+        return crud.delete_expired_idempotency_keys(session=session)
+
+
+async def _status(txid: str, slots: asyncio.Semaphore) -> str | None:
+    async with slots:
+        try:
+            charge_data = await charge_cache.get(txid, get_client().detail_charge)
+        except PixError as e:
+            logger.warning("Could not read charge %s: %s", txid, e)
+            return None
+    if charge_data is None:
+        # the PSP answered it doesn't know the charge
+        return "failed"
+    return charge_status(Charge(**charge_data))
+
+
+async def reconcile(
+    batch_size: int = settings.PAYMENT_RECONCILE_BATCH_SIZE,
+    concurrency: int = settings.PAYMENT_RECONCILE_CONCURRENCY,
+) -> Counter[str]:
+    """
+    Go once over every pending payment, reading the charges `concurrency` at
+    a time and settling each batch with one update per new status.
+
+    Returns how many payments moved to each status.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    changed: Counter[str] = Counter()
+    after: uuid.UUID | None = None
+    while True:
+        # the database calls block, keep them off the event loop
+        batch = await anyio.to_thread.run_sync(_pending_batch, after, batch_size)
+        if not batch:
+            return changed
+        after = batch[-1][0]
+        statuses = await asyncio.gather(*(_status(txid, slots) for _, txid in batch))
+        changes: dict[str, list[uuid.UUID]] = defaultdict(list)
+        for (payment_id, _), status in zip(batch, statuses, strict=True):
+            if status is not None and status != "pending":
+                changes[status].append(payment_id)
+        if changes:
+            changed += await anyio.to_thread.run_sync(_transition, changes)
+
+
+async def run(interval: float = settings.PAYMENT_RECONCILE_INTERVAL_SECONDS) -> None:
+    """
+    Reconcile every `interval` seconds, until cancelled, also dropping the
+    expired idempotency keys.
+    """
+    while True:
+        try:
+            changed = await reconcile()
+            if changed:
+                logger.info("Reconciled payments: %s", dict(changed))
+            await anyio.to_thread.run_sync(_delete_expired_idempotency_keys)
+        except Exception:
+            logger.exception("Payment reconciliation failed")
+        await asyncio.sleep(interval)
+
+
+async def _main(once: bool) -> None:
+    try:
+        if once:
+            logger.info("Reconciled payments: %s", dict(await reconcile()))
+        else:
+            await run()
+    finally:
+        await close_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile pending payments")
+    parser.add_argument("--once", action="store_true", help="a single pass")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import ColumnElement, Integer, Select, literal, or_
+from sqlmodel import select
+
+from app.models import OperatingDateTime, operating_week_range
+
+# restaurants and bookings are all in São Paulo time
+TIMEZONE = ZoneInfo("America/Sao_Paulo")
+
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+
+
+def now() -> datetime:
+    return datetime.now(TIMEZONE)
+
+
+def minute_of_week(at: datetime) -> int:
+    """
+    Minutes since monday 00:00, the unit of OperatingDateTime.open_minute and
+    close_minute.
+    """
+    return at.weekday() * DAY_MINUTES + at.hour * 60 + at.minute
+
+
+def is_open_at(at: datetime) -> ColumnElement[bool]:
+    """
+    OperatingDateTime rows whose opening interval contains `at`, served by the
+    GiST index on the interval.
+    """
+    minute = minute_of_week(at)
+    # sunday night intervals end past the end of the week, so they're also
+    # checked against the same minute one week later
+    return or_(
+        operating_week_range.op("@>")(literal(minute, Integer)),
+        operating_week_range.op("@>")(literal(minute + WEEK_MINUTES, Integer)),
+    )
+
+
+def open_restaurant_ids(at: datetime) -> Select[Any]:
+    return select(OperatingDateTime.restaurant_id).where(is_open_at(at))
@@ -0,0 +1,110 @@
+import re
+from enum import Enum
+from typing import Any
+
+from sqlalchemy import ColumnElement, Float, Select, func
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from app.models import RESTAURANT_SEARCH_CONFIG, Restaurant, restaurant_search_vector
+
+# letters/digits only, so user input can never inject tsquery operators
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# minimum word similarity for a fuzzy match, "pizaria" vs "pizzaria" is ~0.8
+FUZZY_THRESHOLD = 0.4
+FUZZY_ADDRESS_WEIGHT = 0.5
+
+
+class SearchMode(str, Enum):
+    fulltext = "fulltext"
+    fuzzy = "fuzzy"
+
+
+def fulltext_query(query: str) -> ColumnElement[str] | None:
+    """
+    Build a tsquery matching any word of the query, each one as a prefix so
+    partially typed words still match. Returns None if there's nothing to search.
+    """
+    words = WORD_PATTERN.findall(query.lower())
+    if not words:
+        return None
+    return func.to_tsquery(
+        RESTAURANT_SEARCH_CONFIG, " | ".join(f"{word}:*" for word in words)
+    )
+
+
+def normalize(value: Any) -> ColumnElement[str]:
+    # must be the exact expression of the trigram indexes (app/models.py)
+    return func.f_unaccent(func.lower(value))
+
+
+def _match(
+    query: str, mode: SearchMode
+) -> tuple[ColumnElement[bool], ColumnElement[float]] | None:
+    if mode == SearchMode.fuzzy:
+        text = normalize(query.strip())
+        name = normalize(Restaurant.name)
+        address = normalize(Restaurant.address)
+        # `<%` is the word similarity operator, served by the GIN trigram indexes
+        condition: ColumnElement[bool] = text.op("<%")(name) | text.op("<%")(address)
+        relevance = func.word_similarity(text, name) + FUZZY_ADDRESS_WEIGHT * (
+            func.coalesce(func.word_similarity(text, address), 0)
+        )
+        return condition, relevance
+
+    tsquery = fulltext_query(query)
+    if tsquery is None:
+        return None
+    condition = restaurant_search_vector.op("@@")(tsquery)
+    # typed, for the cursors of the pages sorted by it
+    relevance = func.ts_rank_cd(restaurant_search_vector, tsquery, type_=Float)
+    return condition, relevance
+
+
+def prepare(session: Session, mode: SearchMode) -> None:
+    """
+    Set up the current transaction for a search in the given mode.
+    """
+    if mode == SearchMode.fuzzy:
+        # transaction scoped, so it never leaks to other users of the connection
+        session.execute(
+            select(
+                func.set_config(
+                    "pg_trgm.word_similarity_threshold", str(FUZZY_THRESHOLD), True
+                )
+            )
+        )
+
+
+def search_statement(
+    query: str, mode: SearchMode
+) -> tuple[Select[Any], ColumnElement[float]] | None:
+    """
+    Restaurants matching the query and their relevance, to be sorted on.
+
+    Rows are (Restaurant, relevance, total), where total is the number of
+    matches, computed in the same pass since ranking already visits them all.
+    """
+    match = _match(query, mode)
+    if match is None:
+        return None
+    condition, relevance = match
+    statement = select(
+        Restaurant,
+        relevance.label("relevance"),
+        func.count().over().label("total"),
+    ).where(condition)
+    return statement, relevance
+
+
+def match_statement(query: str, mode: SearchMode) -> Select[Any] | None:
+    """
+    Ids of the restaurants matching the query, unranked, to be counted (or
+    their number estimated by the planner).
+    """
+    match = _match(query, mode)
+    if match is None:
+        return None
+    condition, _ = match
+    return select(Restaurant.id).where(condition)
@@ -79,6 +79,72 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    for _ in range(3):
+        create_random_item(db)
+    first = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 2},
+    ).json()
+    assert len(first["data"]) == 2
+    assert first["next_cursor"]
+    second = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 2, "cursor": first["next_cursor"]},
+    ).json()
+    offset = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 2, "skip": 2},
+    ).json()
+    assert second["data"] == offset["data"]
+
+
+def test_read_items_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_read_items_count_modes(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    for _ in range(2):
+        create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/"
+    exact = client.get(url, headers=superuser_token_headers, params={"limit": 1}).json()
+    everything = client.get(
+        url,
+        headers=superuser_token_headers,
+        params={"limit": 10_000, "count_mode": "none"},
+    ).json()
+    assert exact["count"] == len(everything["data"]) >= 2
+    assert exact["has_more"] is True
+    skipped = client.get(
+        url,
+        headers=superuser_token_headers,
+        params={"limit": 1, "count_mode": "none"},
+    ).json()
+    assert skipped["count"] is None
+    assert skipped["has_more"] is True
+    estimated = client.get(
+        url,
+        headers=superuser_token_headers,
+        params={"limit": 1, "count_mode": "estimate"},
+    ).json()
+    assert isinstance(estimated["count"], int)
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -0,0 +1,233 @@
+import uuid
+from collections.abc import Iterator
+from typing import Any
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from app import crud, payment
+from app.core.config import settings
+from app.models import Book, Payment, User
+from app.payment import ChargeCache, PixClient
+from app.tests.utils import fake_psp
+from app.tests.utils.payment import create_pending_payment, create_random_book
+
+
+@pytest.fixture
+def fake_pix(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    fake_psp.reset()
+    pix_client = PixClient(
+        base_url="http://fake-psp",
+        client_id="client",
+        client_secret="secret",
+        transport=httpx.ASGITransport(app=fake_psp.app),
+    )
+    monkeypatch.setattr(payment, "_client", pix_client)
+    monkeypatch.setattr(payment, "charge_cache", ChargeCache(ttl=0))
+    yield
+    client.portal.call(pix_client.aclose)  # type: ignore[union-attr]
+
+
+@pytest.fixture
+def payer(db: Session) -> User:
+    user = crud.get_user_by_email(session=db, email=settings.FIRST_SUPERUSER)
+    assert user
+    if not user.full_name:
+        user.full_name = "Super User"
+        db.add(user)
+        db.commit()
+    return user
+
+
+def create_payment(
+    client: TestClient, headers: dict[str, str], book: Book
+) -> httpx.Response:
+    return client.post(
+        f"{settings.API_V1_STR}/payments/",
+        headers=headers,
+        json={"book_id": str(book.id), "owner_id": str(book.owner_id)},
+    )
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_create_payment_idempotency_key(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    payer: User,
+) -> None:
+    book = create_random_book(db, owner_id=payer.id)
+    headers = {**superuser_token_headers, "Idempotency-Key": str(uuid.uuid4())}
+    first = create_payment(client, headers, book)
+    assert first.status_code == 200
+    # even once paid, a retry gets the same response and no new charge
+    crud.transition_payments(
+        session=db, payment_ids=[uuid.UUID(first.json()["id"])], status="paid"
+    )
+    retry = create_payment(client, headers, book)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert fake_psp.calls["POST /v2/cob"] == 1
+
+    other_book = create_random_book(db, owner_id=payer.id)
+    response = create_payment(client, headers, other_book)
+    assert response.status_code == 422
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_create_payment_reuses_active_charge(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    payer: User,
+) -> None:
+    book = create_random_book(db, owner_id=payer.id)
+    first = create_payment(client, superuser_token_headers, book)
+    second = create_payment(client, superuser_token_headers, book)
+    assert second.json()["id"] == first.json()["id"]
+    assert fake_psp.calls["POST /v2/cob"] == 1
+
+    fake_psp.set_status(first.json()["charge"]["txid"], "REMOVIDA_PELO_PSP")
+    third = create_payment(client, superuser_token_headers, book)
+    assert third.json()["id"] != first.json()["id"]
+    assert fake_psp.calls["POST /v2/cob"] == 2
+    count = db.exec(
+        select(func.count()).select_from(Payment).where(Payment.book_id == book.id)
+    ).one()
+    assert count == 2
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_read_payment_only_reads_database(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    payer: User,
+) -> None:
+    book = create_random_book(db, owner_id=payer.id)
+    created = create_payment(client, superuser_token_headers, book).json()
+    fake_psp.set_status(created["charge"]["txid"], "CONCLUIDA")
+    r = client.get(
+        f"{settings.API_V1_STR}/payments/{created['id']}",
+        headers=superuser_token_headers,
+    )
+    assert r.status_code == 200
+    assert r.json()["status"] == "pending"
+    assert not any(call.startswith("GET") for call in fake_psp.calls)
+
+
+def pix(txid: str | None, valor: str = "10.00") -> dict[str, Any]:
+    return {
+        "endToEndId": f"E{uuid.uuid4().hex}",
+        "txid": txid,
+        "chave": "key",
+        "valor": valor,
+        "horario": "2024-11-20T21:12:40.318Z",
+    }
+
+
+def paid_payment(db: Session) -> Payment:
+    """
+    A pending payment whose charge the PSP already has as paid.
+    """
+    return create_pending_payment(db, token=fake_psp.add_charge(status="CONCLUIDA"))
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_pix_webhook_settles_batch(client: TestClient, db: Session) -> None:
+    paid = [paid_payment(db) for _ in range(3)]
+    notifications = [pix(p.token) for p in paid] + [pix(None)]
+    response = client.post(
+        f"{settings.API_V1_STR}/payments/webhook/pix", json={"pix": notifications}
+    )
+    assert response.status_code == 200
+    assert response.json()["message"] == "3 payments settled"
+    for p in paid:
+        db.refresh(p)
+        assert p.status == "paid"
+        book = db.get(Book, p.book_id)
+        assert book
+        db.refresh(book)
+        assert book.active
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_pix_webhook_is_idempotent(client: TestClient, db: Session) -> None:
+    paid = paid_payment(db)
+    batch = {"pix": [pix(paid.token)]}
+    for expected in ("1 payments settled", "0 payments settled"):
+        response = client.post(f"{settings.API_V1_STR}/payments/webhook", json=batch)
+        assert response.status_code == 200
+        assert response.json()["message"] == expected
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_pix_webhook_partial_payments(client: TestClient, db: Session) -> None:
+    paid = paid_payment(db)
+    half = pix(paid.token, "5.00")
+    # redelivering the same PIX doesn't add up
+    response = client.post(
+        f"{settings.API_V1_STR}/payments/webhook", json={"pix": [half, half]}
+    )
+    assert response.json()["message"] == "0 payments settled"
+    db.refresh(paid)
+    assert paid.status == "pending"
+    response = client.post(
+        f"{settings.API_V1_STR}/payments/webhook",
+        json={"pix": [half, pix(paid.token, "5.00")]},
+    )
+    assert response.json()["message"] == "1 payments settled"
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_pix_webhook_unpaid_charge(client: TestClient, db: Session) -> None:
+    # the notification of a charge the PSP doesn't have as paid, or at all
+    pending = create_pending_payment(db, token=fake_psp.add_charge())
+    unknown = create_pending_payment(db)
+    response = client.post(
+        f"{settings.API_V1_STR}/payments/webhook",
+        json={"pix": [pix(pending.token), pix(unknown.token)]},
+    )
+    assert response.status_code == 200
+    assert response.json()["message"] == "0 payments settled"
+    for p in (pending, unknown):
+        db.refresh(p)
+        assert p.status == "pending"
+
+
+def test_pix_webhook_registration(client: TestClient) -> None:
+    response = client.post(f"{settings.API_V1_STR}/payments/webhook", json={})
+    assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("fake_pix")
+def test_pix_webhook_hmac(
+    client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "EFIPAY_WEBHOOK_HMAC", "secret")
+    paid = paid_payment(db)
+    batch = {"pix": [pix(paid.token)]}
+    response = client.post(
+        f"{settings.API_V1_STR}/payments/webhook?hmac=wrong", json=batch
+    )
+    assert response.status_code == 403
+    response = client.post(
+        f"{settings.API_V1_STR}/payments/webhook?hmac=secret", json=batch
+    )
+    assert response.status_code == 200
+    settled = db.get(Payment, paid.id, populate_existing=True)
+    assert settled and settled.status == "paid"
+
+
+def test_pix_webhook_hmac_required(
+    client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "EFIPAY_WEBHOOK_HMAC", None)
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+    pending = create_pending_payment(db)
+    response = client.post(
+        f"{settings.API_V1_STR}/payments/webhook", json={"pix": [pix(pending.token)]}
+    )
+    assert response.status_code == 403
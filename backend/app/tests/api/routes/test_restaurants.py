@@ -0,0 +1,236 @@
+import uuid
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import schedule
+from app.core.config import settings
+from app.models import Item, OperatingDateTime, WeekEnum
+from app.tests.utils.payment import create_random_book
+from app.tests.utils.restaurant import create_random_restaurant
+from app.tests.utils.utils import random_lower_string
+
+
+def test_search_restaurants_ranks_name_first(client: TestClient, db: Session) -> None:
+    word = random_lower_string()
+    in_address = create_random_restaurant(db, address=f"Rua {word}")
+    in_name = create_random_restaurant(db, name=f"Churrascaria {word}")
+    in_description = create_random_restaurant(db, description=f"O melhor {word}")
+    r = client.get(f"{settings.API_V1_STR}/restaurants/search", params={"query": word})
+    assert r.status_code == 200
+    content = r.json()
+    assert content["count"] == 3
+    assert [restaurant["id"] for restaurant in content["data"]] == [
+        str(in_name.id),
+        str(in_description.id),
+        str(in_address.id),
+    ]
+
+
+def test_search_restaurants_prefix(client: TestClient, db: Session) -> None:
+    word = random_lower_string()
+    restaurant = create_random_restaurant(db, name=f"Pizzaria {word}")
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/search", params={"query": word[:10]}
+    )
+    assert r.status_code == 200
+    assert str(restaurant.id) in [item["id"] for item in r.json()["data"]]
+
+
+def test_search_restaurants_no_words(client: TestClient) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/search", params={"query": "?! --"}
+    )
+    assert r.status_code == 200
+    assert r.json() == {
+        "data": [],
+        "count": 0,
+        "has_more": False,
+        "next_cursor": None,
+    }
+
+
+def test_search_restaurants_empty_query(client: TestClient) -> None:
+    r = client.get(f"{settings.API_V1_STR}/restaurants/search", params={"query": "  "})
+    assert r.status_code == 400
+
+
+def test_search_restaurants_fuzzy(client: TestClient, db: Session) -> None:
+    word = random_lower_string()
+    restaurant = create_random_restaurant(db, name=f"Churrascaria Japonês {word}")
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/search",
+        params={"query": f"churascaria japones {word}", "mode": "fuzzy"},
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert content["data"][0]["id"] == str(restaurant.id)
+
+
+def test_search_restaurants_cursor(client: TestClient, db: Session) -> None:
+    word = random_lower_string()
+    for _ in range(3):
+        create_random_restaurant(db, name=f"Bar {word}")
+    url = f"{settings.API_V1_STR}/restaurants/search"
+    first = client.get(url, params={"query": word, "limit": 2}).json()
+    second = client.get(
+        url, params={"query": word, "limit": 2, "cursor": first["next_cursor"]}
+    ).json()
+    assert first["count"] == second["count"] == 3
+    assert len(second["data"]) == 1
+    assert second["next_cursor"] is None
+    ids = {restaurant["id"] for restaurant in first["data"] + second["data"]}
+    assert len(ids) == 3
+
+
+def test_search_restaurants_count_estimate(client: TestClient, db: Session) -> None:
+    word = random_lower_string()
+    for _ in range(20):
+        create_random_restaurant(db, name=f"Cantina {word}")
+        # and rows not matching, the statistics need some to tell them apart
+        create_random_restaurant(db)
+        create_random_restaurant(db)
+    # the estimate comes from the statistics of the matching rows
+    db.execute(text("ANALYZE restaurant"))
+    db.commit()
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/search",
+        params={"query": word, "count_mode": "estimate"},
+    )
+    assert r.status_code == 200
+    assert r.json()["count"] > 1
+
+
+def test_read_restaurants_only_open(client: TestClient, db: Session) -> None:
+    now = schedule.now()
+    days = list(WeekEnum)
+    soon = (now + timedelta(minutes=1)).time()
+    # closing at the opening time means 24 hours, so opened yesterday and
+    # closes in a minute
+    overnight = create_random_restaurant(db)
+    db.add(
+        OperatingDateTime(
+            restaurant_id=overnight.id,
+            day_of_week=days[(now.weekday() - 1) % 7],
+            open_time=soon,
+            close_time=soon,
+        )
+    )
+    closed = create_random_restaurant(db)
+    db.add(
+        OperatingDateTime(
+            restaurant_id=closed.id,
+            day_of_week=days[(now.weekday() + 1) % 7],
+            open_time=(now - timedelta(hours=1)).time(),
+            close_time=(now + timedelta(hours=1)).time(),
+        )
+    )
+    db.commit()
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/",
+        params={"count_mode": "none", "limit": 1000},
+    )
+    assert r.status_code == 200
+    ids = [restaurant["id"] for restaurant in r.json()["data"]]
+    assert str(overnight.id) in ids
+    assert str(closed.id) not in ids
+
+
+def test_read_restaurant_limits_collections(client: TestClient, db: Session) -> None:
+    book = create_random_book(db)
+    restaurant_id = book.restaurant_id
+    for title in ("b", "a", "c"):
+        db.add(Item(title=title, restaurant_id=restaurant_id, owner_id=book.owner_id))
+    db.commit()
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/{restaurant_id}",
+        params={"items_limit": 2, "books_limit": 0},
+    )
+    assert r.status_code == 200
+    content = r.json()
+    assert [item["title"] for item in content["items"]] == ["a", "b"]
+    assert content["books"] == []
+
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/{restaurant_id}",
+        params={"items_limit": 101},
+    )
+    assert r.status_code == 422
+
+
+def test_read_restaurant_items(client: TestClient, db: Session) -> None:
+    book = create_random_book(db)
+    restaurant_id = book.restaurant_id
+    for title in ("b", "a", "c"):
+        db.add(Item(title=title, restaurant_id=restaurant_id, owner_id=book.owner_id))
+    db.commit()
+    url = f"{settings.API_V1_STR}/restaurants/{restaurant_id}/items"
+    r = client.get(url, params={"limit": 2})
+    assert r.status_code == 200
+    content = r.json()
+    assert content["count"] == 3
+    assert [item["title"] for item in content["data"]] == ["a", "b"]
+    r = client.get(url, params={"limit": 2, "cursor": content["next_cursor"]})
+    assert [item["title"] for item in r.json()["data"]] == ["c"]
+    assert not r.json()["has_more"]
+
+
+def test_read_restaurant_books(client: TestClient, db: Session) -> None:
+    book = create_random_book(db)
+    r = client.get(f"{settings.API_V1_STR}/restaurants/{book.restaurant_id}/books")
+    assert r.status_code == 200
+    assert [item["id"] for item in r.json()["data"]] == [str(book.id)]
+    assert r.headers["cache-control"] == "private, no-cache"
+
+    r = client.get(f"{settings.API_V1_STR}/restaurants/{uuid.uuid4()}/books")
+    assert r.status_code == 404
+
+
+def test_read_restaurant_books_cursor_of_other_endpoint(
+    client: TestClient, db: Session
+) -> None:
+    book = create_random_book(db)
+    word = random_lower_string()
+    for _ in range(2):
+        create_random_restaurant(db, name=f"Cantina {word}")
+    search = client.get(
+        f"{settings.API_V1_STR}/restaurants/search",
+        params={"query": word, "limit": 1},
+    ).json()
+    listing = client.get(
+        f"{settings.API_V1_STR}/restaurants/",
+        params={"only_open": False, "limit": 1, "count_mode": "none"},
+    ).json()
+    url = f"{settings.API_V1_STR}/restaurants/{book.restaurant_id}/books"
+    # (relevance, id) and (name, id) where (created_at, id) is expected
+    for cursor in (search["next_cursor"], listing["next_cursor"]):
+        r = client.get(url, params={"cursor": cursor})
+        assert r.status_code == 400
+        assert r.json()["detail"] == "Invalid cursor"
+    r = client.get(
+        f"{settings.API_V1_STR}/restaurants/search",
+        params={"query": word, "cursor": listing["next_cursor"]},
+    )
+    assert r.status_code == 400
+
+
+def test_read_restaurant_not_modified(client: TestClient, db: Session) -> None:
+    book = create_random_book(db)
+    url = f"{settings.API_V1_STR}/restaurants/{book.restaurant_id}"
+    r = client.get(url)
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert r.headers["cache-control"] == "private, no-cache"
+
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert not r.content
+
+    db.add(Item(title="new", restaurant_id=book.restaurant_id, owner_id=book.owner_id))
+    db.commit()
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert [item["title"] for item in r.json()["items"]] == ["new"]
@@ -1,4 +1,5 @@
 import uuid
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
@@ -7,7 +8,9 @@ from sqlmodel import Session, select
 from app import crud
 from app.core.config import settings
 from app.core.security import verify_password
-from app.models import User, UserCreate
+from app.models import Book, Payment, User, UserCreate, UserUpdate
+from app.tests.utils.restaurant import create_random_restaurant
+from app.tests.utils.user import create_random_user, user_authentication_headers
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -33,6 +36,34 @@ def test_get_users_normal_user_me(
     assert current_user["email"] == settings.EMAIL_TEST_USER
 
 
+def test_get_users_me_paid_books(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    restaurant = create_random_restaurant(db, book_price=1000)
+    book = Book(
+        restaurant_id=restaurant.id,
+        owner_id=user.id,
+        people_quantity=2,
+        reserved_for=datetime.utcnow() + timedelta(days=1),
+    )
+    db.add(book)
+    db.commit()
+    payment = Payment(book_id=book.id, owner_id=user.id, value=1000)
+    db.add(payment)
+    db.commit()
+    crud.transition_payment(session=db, payment=payment, status="paid")
+
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers)
+    assert r.status_code == 200
+    content = r.json()
+    books = {item["id"]: item for item in content["books"]}
+    assert books[str(book.id)]["active"] is True
+    payments = {item["id"]: item for item in content["payments"]}
+    assert payments[str(payment.id)]["status"] == "paid"
+
+
 def test_create_user_new_email(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -320,6 +351,21 @@ def test_register_user_already_exists_error(client: TestClient) -> None:
     assert r.json()["detail"] == "The user with this email already exists in the system"
 
 
+def test_register_user_cpf_already_exists_error(
+    client: TestClient, db: Session
+) -> None:
+    user = create_random_user(db)
+    data = {
+        "email": random_email(),
+        "password": random_lower_string(),
+        "cpf": user.cpf,
+    }
+    r = client.post(f"{settings.API_V1_STR}/users/signup", json=data)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "The user with this CPF already exists in the system"
+    assert not crud.get_user_by_email(session=db, email=data["email"])
+
+
 def test_update_user(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -346,6 +392,33 @@ def test_update_user(
     assert user_db.full_name == "Updated_full_name"
 
 
+def test_update_user_deactivated_token_rejected(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user = create_random_user(db)
+    password = random_lower_string()
+    crud.update_user(
+        session=db, db_user=user, user_in=UserUpdate(password=password, cpf=user.cpf)
+    )
+    headers = user_authentication_headers(
+        client=client, email=user.email, password=password
+    )
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"is_active": False, "cpf": user.cpf},
+    )
+    assert r.status_code == 200
+
+    # the cached principal is dropped with the update
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 400
+    assert r.json() == {"detail": "Inactive user"}
+
+
 def test_update_user_not_exists(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
@@ -0,0 +1,92 @@
+from collections.abc import Generator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.api.async_routes import books, items, payments, restaurants
+from app.api.main import api_router
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models import Item
+from app.tests.utils.restaurant import create_random_restaurant
+
+
+@pytest.fixture(scope="module")
+def async_client() -> Generator[TestClient, None, None]:
+    app = FastAPI()
+    for router, prefix in (
+        (items.router, "/items"),
+        (restaurants.router, "/restaurants"),
+        (books.router, "/books"),
+        (payments.router, "/payments"),
+    ):
+        app.include_router(router, prefix=f"{settings.API_V1_STR}{prefix}")
+    # login, users and utils have no async version
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+    with TestClient(app) as c:
+        yield c
+        # its connections belong to this client's event loop
+        c.portal.call(async_engine.dispose)  # type: ignore[union-attr]
+
+
+def test_async_read_items(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    restaurant = create_random_restaurant(db)
+    item = Item(title="Foo", restaurant_id=restaurant.id, owner_id=restaurant.owner_id)
+    db.add(item)
+    db.commit()
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/{item.id}", headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["title"] == item.title
+    response = async_client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 1},
+    )
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 1
+
+
+def test_async_create_update_delete_item(
+    async_client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    restaurant = create_random_restaurant(db)
+    url = f"{settings.API_V1_STR}/items/"
+    data = {"title": "Foo", "restaurant_id": str(restaurant.id)}
+    created = async_client.post(url, headers=superuser_token_headers, json=data)
+    assert created.status_code == 200
+    item_url = f"{url}{created.json()['id']}"
+    updated = async_client.put(
+        item_url, headers=superuser_token_headers, json={**data, "title": "Bar"}
+    )
+    assert updated.json()["title"] == "Bar"
+    deleted = async_client.delete(item_url, headers=superuser_token_headers)
+    assert deleted.status_code == 200
+    assert (
+        async_client.get(item_url, headers=superuser_token_headers).status_code == 404
+    )
+
+
+def test_async_read_restaurant(async_client: TestClient, db: Session) -> None:
+    restaurant = create_random_restaurant(db)
+    response = async_client.get(f"{settings.API_V1_STR}/restaurants/{restaurant.id}")
+    assert response.status_code == 200
+    content = response.json()
+    assert content["name"] == restaurant.name
+    assert content["items"] == []
+    assert content["operating_date_times"] == []
+
+
+def test_async_search_restaurants(async_client: TestClient, db: Session) -> None:
+    restaurant = create_random_restaurant(db, name="Cantina Assíncrona")
+    response = async_client.get(
+        f"{settings.API_V1_STR}/restaurants/search",
+        params={"query": "assincrona", "mode": "fuzzy"},
+    )
+    assert response.status_code == 200
+    assert str(restaurant.id) in [r["id"] for r in response.json()["data"]]
@@ -0,0 +1,72 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from fastapi import Request, Response
+
+from app.api import conditional
+from app.api.conditional import Version
+
+VERSION = Version(etag='W/"abc"')
+
+
+@dataclass
+class Row:
+    id: uuid.UUID
+    updated_at: datetime
+
+
+def test_version_of_rows() -> None:
+    rows = [Row(uuid.uuid4(), datetime(2024, 11, 28, 14, 30)) for _ in range(2)]
+    version = conditional.version(rows, 2, "next")
+    assert conditional.version(rows, 2, "next") == version
+    assert conditional.version(rows[:1], 2, "next").etag != version.etag
+    assert conditional.version(rows, 2, None).etag != version.etag
+    rows[1].updated_at = datetime(2024, 11, 28, 14, 31)
+    assert conditional.version(rows, 2, "next").etag != version.etag
+
+
+def make_request(**headers: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_check_sets_validators() -> None:
+    response = Response()
+    assert conditional.check(make_request(), response, VERSION) is None
+    assert response.headers["etag"] == 'W/"abc"'
+    assert "last-modified" not in response.headers
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+    response = Response()
+    conditional.check(make_request(), response, VERSION, public=False)
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_check_if_none_match() -> None:
+    for if_none_match in ('W/"abc"', '"abc"', '"other", W/"abc"', "*"):
+        not_modified = conditional.check(
+            make_request(if_none_match=if_none_match), Response(), VERSION
+        )
+        assert not_modified is not None
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == 'W/"abc"'
+    assert (
+        conditional.check(make_request(if_none_match='"other"'), Response(), VERSION)
+        is None
+    )
+
+
+def test_check_ignores_if_modified_since() -> None:
+    # a date can't tell that a row of the list was deleted since
+    request = make_request(if_modified_since="Thu, 28 Nov 2099 15:00:00 GMT")
+    assert conditional.check(request, Response(), VERSION) is None
@@ -0,0 +1,68 @@
+import json
+import uuid
+from datetime import datetime
+
+from fastapi import Response
+
+from app.api.responses import json_response, page_response
+from app.models import Book, BooksPublic, User, UserPublic, UsersPublic
+
+
+def make_book() -> Book:
+    return Book(
+        restaurant_id=uuid.uuid4(),
+        owner_id=uuid.uuid4(),
+        people_quantity=2,
+        reserved_for=datetime(2024, 11, 28, 20, 0),
+    )
+
+
+def test_page_response_matches_model() -> None:
+    books = [make_book(), make_book()]
+    response = page_response(BooksPublic, books, 2, "next")
+    assert response.media_type == "application/json"
+    expected = BooksPublic(
+        data=books,
+        count=2,
+        has_more=True,
+        next_cursor="next",
+    )
+    assert json.loads(bytes(response.body)) == expected.model_dump(mode="json")
+
+
+def test_page_response_only_public_fields() -> None:
+    user = User(email="user@example.com", cpf="52998224725", hashed_password="x")
+    response = page_response(UsersPublic, [user], 1, None)
+    page = json.loads(bytes(response.body))
+    assert page["has_more"] is False
+    assert "hashed_password" not in page["data"][0]
+    assert page["data"][0]["id"] == str(user.id)
+
+
+class UnloadedActive:
+    """A book row whose `active` column isn't loaded until it's read."""
+
+    def __init__(self, book: Book) -> None:
+        self.__dict__.update(book.__dict__)
+        del self.__dict__["active"]
+
+    @property
+    def active(self) -> bool:
+        return True
+
+
+def test_page_response_unloaded_column() -> None:
+    response = page_response(BooksPublic, [UnloadedActive(make_book())], None, None)
+    assert json.loads(bytes(response.body))["data"][0]["active"] is True
+
+
+def test_json_response_keeps_headers() -> None:
+    handler_response = Response()
+    handler_response.headers["ETag"] = 'W/"abc"'
+    handler_response.headers["Cache-Control"] = "private, no-cache"
+    user = User(email="user@example.com", cpf="52998224725", hashed_password="x")
+    response = json_response(UserPublic, user, handler_response)
+    assert response.headers["etag"] == 'W/"abc"'
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert int(response.headers["content-length"]) == len(response.body)
+    assert json.loads(bytes(response.body))["email"] == "user@example.com"
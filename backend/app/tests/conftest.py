@@ -1,5 +1,6 @@
-from collections.abc import Generator
+from collections.abc import AsyncIterator, Generator
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, delete
@@ -7,7 +8,9 @@ from sqlmodel import Session, delete
 from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
-from app.models import Item, User
+from app.models import Item, Payment, User
+from app.payment import PixClient
+from app.tests.utils import fake_psp
 from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
@@ -19,6 +22,9 @@ def db() -> Generator[Session, None, None]:
         yield session
         statement = delete(Item)
         session.execute(statement)
+        # payments don't cascade from their user
+        statement = delete(Payment)
+        session.execute(statement)
         statement = delete(User)
         session.execute(statement)
         session.commit()
@@ -40,3 +46,21 @@ def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]
     return authentication_token_from_email(
         client=client, email=settings.EMAIL_TEST_USER, db=db
     )
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def pix_client() -> AsyncIterator[PixClient]:
+    fake_psp.reset()
+    client = PixClient(
+        base_url="http://fake-psp",
+        client_id="client",
+        client_secret="secret",
+        transport=httpx.ASGITransport(app=fake_psp.app),
+    )
+    yield client
+    await client.aclose()
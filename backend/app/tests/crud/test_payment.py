@@ -0,0 +1,132 @@
+import uuid
+from typing import Any
+
+import pytest
+from sqlmodel import Session
+
+from app import crud
+from app.models import Book, PaymentUpdate
+from app.tests.utils.payment import create_pending_payment
+
+
+def test_transition_payment_paid_activates_book(db: Session) -> None:
+    payment = create_pending_payment(db)
+    assert crud.transition_payment(session=db, payment=payment, status="paid")
+    assert payment.status == "paid"
+    book = db.get(Book, payment.book_id)
+    assert book
+    db.refresh(book)
+    assert book.active
+
+
+def test_transition_payment_is_applied_once(db: Session) -> None:
+    payment = create_pending_payment(db)
+    assert crud.transition_payment(session=db, payment=payment, status="cancelled")
+    assert not crud.transition_payment(session=db, payment=payment, status="paid")
+    assert payment.status == "cancelled"
+    book = db.get(Book, payment.book_id)
+    assert book
+    db.refresh(book)
+    assert not book.active
+
+
+def test_transition_payments_bulk(db: Session) -> None:
+    payments = [create_pending_payment(db) for _ in range(3)]
+    paid = crud.transition_payments(
+        session=db, payment_ids=[payment.id for payment in payments], status="paid"
+    )
+    assert set(paid) == {payment.id for payment in payments}
+    assert not crud.transition_payments(
+        session=db, payment_ids=[payment.id for payment in payments], status="paid"
+    )
+
+
+def test_update_payment_rejected_writes_nothing(db: Session) -> None:
+    payment = create_pending_payment(db)
+    assert crud.transition_payment(session=db, payment=payment, status="paid")
+    payment_in = PaymentUpdate(
+        book_id=payment.book_id,
+        owner_id=payment.owner_id,
+        payment_type="credit_card",
+        status="pending",
+    )
+    assert not crud.update_payment(session=db, payment=payment, payment_in=payment_in)
+    db.refresh(payment)
+    assert payment.status == "paid"
+    assert payment.payment_type == "pix"
+
+    payment_in.status = "paid"
+    assert crud.update_payment(session=db, payment=payment, payment_in=payment_in)
+    assert payment.payment_type == "credit_card"
+
+
+def test_pay_charges(db: Session) -> None:
+    payment = create_pending_payment(db)
+    underpaid = create_pending_payment(db)
+    assert payment.token and underpaid.token
+    paid = crud.pay_charges(
+        session=db, charges={payment.token: 1000, underpaid.token: 999, "other": 1}
+    )
+    assert paid == [payment.id]
+    assert not crud.pay_charges(session=db, charges={payment.token: 1000})
+
+
+def test_idempotency_key(db: Session) -> None:
+    owner_id = create_pending_payment(db).owner_id
+    key = str(uuid.uuid4())
+    assert not crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="a", ttl=60
+    )
+    in_progress = crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="a", ttl=60
+    )
+    assert in_progress and in_progress.response is None
+    crud.save_idempotent_response(
+        session=db, owner_id=owner_id, key=key, response={"id": "1"}
+    )
+    done = crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="a", ttl=60
+    )
+    assert done and done.response == {"id": "1"}
+
+
+def test_idempotency_key_released_or_expired(db: Session) -> None:
+    owner_id = create_pending_payment(db).owner_id
+    key = str(uuid.uuid4())
+    crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="a", ttl=60
+    )
+    crud.release_idempotency_key(session=db, owner_id=owner_id, key=key)
+    assert not crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="a", ttl=-1
+    )
+    # expired, taken over by the next request
+    assert not crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="b", ttl=60
+    )
+
+
+def test_idempotency_key_released_while_claiming(
+    db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    owner_id = create_pending_payment(db).owner_id
+    key = str(uuid.uuid4())
+    crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="a", ttl=60
+    )
+    get = db.get
+
+    # the holder gives the key up between the insert and the read
+    def get_after_release(*args: Any, **kwargs: Any) -> Any:
+        monkeypatch.setattr(db, "get", get)
+        crud.release_idempotency_key(session=db, owner_id=owner_id, key=key)
+        return get(*args, **kwargs)
+
+    monkeypatch.setattr(db, "get", get_after_release)
+    assert not crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="b", ttl=60
+    )
+    held = crud.claim_idempotency_key(
+        session=db, owner_id=owner_id, key=key, request_hash="b", ttl=60
+    )
+    assert held and held.request_hash == "b"
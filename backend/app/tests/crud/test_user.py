@@ -1,10 +1,13 @@
+import pytest
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session
 
 from app import crud
 from app.core.security import verify_password
 from app.models import User, UserCreate, UserUpdate
-from app.tests.utils.utils import random_email, random_lower_string
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_cpf, random_email, random_lower_string
 
 
 def test_create_user(db: Session) -> None:
@@ -89,3 +92,15 @@ def test_update_user(db: Session) -> None:
     assert user_2
     assert user.email == user_2.email
     assert verify_password(new_password, user_2.hashed_password)
+
+
+def test_create_user_taken_email_or_cpf(db: Session) -> None:
+    user = create_random_user(db)
+    password = random_lower_string()
+    for user_in, field in [
+        (UserCreate(email=user.email, password=password, cpf=random_cpf()), "email"),
+        (UserCreate(email=random_email(), password=password, cpf=user.cpf), "cpf"),
+    ]:
+        with pytest.raises(IntegrityError) as e:
+            crud.create_user(session=db, user_create=user_in)
+        assert crud.duplicate_user_field(e.value) == field
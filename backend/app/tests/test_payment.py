@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import Calendario, Charge
+from app.payment import ChargeCache, PixClient, PixError, charge_status
+from app.tests.utils import fake_psp
+
+
+async def create_charge(client: PixClient) -> dict:  # type: ignore[type-arg]
+    charge = await client.create_immediate_charge(
+        expiration=60,
+        cpf="12345678909",
+        name="Fulano",
+        value=1050,
+        key="key",
+        description="booking",
+    )
+    assert charge
+    return charge
+
+
+@pytest.mark.anyio
+async def test_create_and_detail_charge(pix_client: PixClient) -> None:
+    created = await create_charge(pix_client)
+    assert created["valor"]["original"] == "10.50"
+    detail = await pix_client.detail_charge(created["txid"])
+    assert detail
+    assert Charge(**detail).status == "ATIVA"
+
+
+@pytest.mark.anyio
+async def test_access_token_is_reused(pix_client: PixClient) -> None:
+    for _ in range(3):
+        await create_charge(pix_client)
+    assert fake_psp.calls["POST /oauth/token"] == 1
+    assert fake_psp.calls["POST /v2/cob"] == 3
+
+
+@pytest.mark.anyio
+async def test_revoked_access_token_is_renewed(pix_client: PixClient) -> None:
+    await create_charge(pix_client)
+    fake_psp.tokens.clear()
+    await create_charge(pix_client)
+    assert fake_psp.calls["POST /oauth/token"] == 2
+
+
+@pytest.mark.anyio
+async def test_detail_unknown_charge(pix_client: PixClient) -> None:
+    assert await pix_client.detail_charge("unknown") is None
+
+
+@pytest.mark.anyio
+async def test_detail_charge_error(pix_client: PixClient) -> None:
+    txid = fake_psp.add_charge()
+    fake_psp.failures[txid] = 429
+    with pytest.raises(PixError):
+        await pix_client.detail_charge(txid)
+
+
+@pytest.mark.anyio
+async def test_unreachable_psp() -> None:
+    client = PixClient(
+        base_url="http://127.0.0.1:9", client_id="a", client_secret="b", timeout=1
+    )
+    with pytest.raises(PixError):
+        await client.detail_charge("txid")
+    await client.aclose()
+
+
+def test_charge_status() -> None:
+    now = datetime.now(timezone.utc)
+    active = Charge(
+        txid="txid", status="ATIVA", calendario=Calendario(criacao=now, expiracao=60)
+    )
+    assert charge_status(active) == "pending"
+    active.calendario = Calendario(criacao=now - timedelta(minutes=2), expiracao=60)
+    assert charge_status(active) == "cancelled"
+    assert charge_status(Charge(txid="txid", status="CONCLUIDA")) == "paid"
+    assert charge_status(Charge(txid="txid", status="REMOVIDA_PELO_PSP")) == "cancelled"
+
+
+@pytest.mark.anyio
+async def test_charge_cache_coalesces_reads(pix_client: PixClient) -> None:
+    txid = (await create_charge(pix_client))["txid"]
+    cache = ChargeCache(ttl=60)
+    results = await asyncio.gather(
+        *(cache.get(txid, pix_client.detail_charge) for _ in range(10))
+    )
+    assert all(result == results[0] for result in results)
+    assert fake_psp.calls[f"GET /v2/cob/{txid}"] == 1
+
+
+@pytest.mark.anyio
+async def test_charge_cache_active_charge_expires(pix_client: PixClient) -> None:
+    txid = (await create_charge(pix_client))["txid"]
+    cache = ChargeCache(ttl=0)
+    await cache.get(txid, pix_client.detail_charge)
+    fake_psp.set_status(txid, "CONCLUIDA")
+    charge_data = await cache.get(txid, pix_client.detail_charge)
+    assert charge_data and charge_data["status"] == "CONCLUIDA"
+    assert fake_psp.calls[f"GET /v2/cob/{txid}"] == 2
+
+
+@pytest.mark.anyio
+async def test_charge_cache_keeps_final_charges(pix_client: PixClient) -> None:
+    paid = (await create_charge(pix_client))["txid"]
+    fake_psp.set_status(paid, "CONCLUIDA")
+    expired = (await create_charge(pix_client))["txid"]
+    fake_psp.charges[expired]["calendario"]["criacao"] = (
+        datetime.now(timezone.utc) - timedelta(minutes=5)
+    ).isoformat()
+    cache = ChargeCache(ttl=0)
+    for _ in range(3):
+        await cache.get(paid, pix_client.detail_charge)
+        charge_data = await cache.get(expired, pix_client.detail_charge)
+        assert charge_data and charge_status(Charge(**charge_data)) == "cancelled"
+    assert fake_psp.calls[f"GET /v2/cob/{paid}"] == 1
+    assert fake_psp.calls[f"GET /v2/cob/{expired}"] == 1
+
+
+@pytest.mark.anyio
+async def test_charge_cache_put(pix_client: PixClient) -> None:
+    charge_data = await create_charge(pix_client)
+    cache = ChargeCache(ttl=60)
+    cache.put(charge_data)
+    assert await cache.get(charge_data["txid"], pix_client.detail_charge)
+    assert f"GET /v2/cob/{charge_data['txid']}" not in fake_psp.calls
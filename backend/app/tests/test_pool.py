@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.pool import PoolMetrics, engine_options, instrument, timed_pool
+from app.models import User
+
+
+def test_pool_metrics() -> None:
+    metrics = PoolMetrics("test")
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=timed_pool(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    instrument(engine, metrics)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        stats = metrics.snapshot()
+        assert stats["checked_out"] == 1
+        with pytest.raises(TimeoutError):
+            engine.connect()
+    stats = metrics.snapshot()
+    assert stats["size"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["connects"] == 1
+    assert sum(stats["wait_seconds_buckets"].values()) == 1
+
+    # the pool is rebuilt by dispose, the counters go on
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert metrics.snapshot()["checkouts"] == 2
+    engine.dispose()
+
+
+def test_pgbouncer_engine_options(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "DB_POOL_MODE", "pgbouncer")
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 1000)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 0)
+    options = engine_options(PoolMetrics("test"))
+    assert options["poolclass"] is NullPool
+    assert options["connect_args"] == {"prepare_threshold": None}
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 2)
+    options = engine_options(PoolMetrics("test"))
+    assert options["pool_size"] == 2
+    assert "options" not in options["connect_args"]
+
+
+@pytest.mark.skipif(
+    settings.DB_POOL_MODE != "pgbouncer", reason="runs through PgBouncer only"
+)
+def test_pgbouncer_repeated_statements() -> None:
+    # psycopg would prepare the statement after a few runs, and the next
+    # transaction on another server connection would fail to find it
+    statement = select(User).where(User.email == settings.FIRST_SUPERUSER)
+    for _ in range(20):
+        with Session(engine) as session:
+            assert session.exec(statement).first()
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        with Session(engine) as session:
+            timeout = session.exec(text("SHOW statement_timeout")).one()  # type: ignore[call-overload]
+            assert timeout[0] != "0"
@@ -0,0 +1,55 @@
+import uuid
+
+import pytest
+
+from app.principal import PrincipalCache, UserPrincipal
+
+
+def make_principal() -> UserPrincipal:
+    return UserPrincipal(
+        id=uuid.uuid4(),
+        is_active=True,
+        is_superuser=False,
+        cpf="12345678909",
+        full_name="Fulano de Tal",
+    )
+
+
+def test_principal_cache_get() -> None:
+    cache = PrincipalCache(ttl=60)
+    user = make_principal()
+    assert cache.get(user.id) is None
+    cache.put(user)
+    assert cache.get(user.id) is user
+
+
+def test_principal_cache_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = PrincipalCache(ttl=30)
+    user = make_principal()
+    monkeypatch.setattr("app.principal.time.monotonic", lambda: 100.0)
+    cache.put(user)
+    monkeypatch.setattr("app.principal.time.monotonic", lambda: 129.0)
+    assert cache.get(user.id) is user
+    monkeypatch.setattr("app.principal.time.monotonic", lambda: 130.0)
+    assert cache.get(user.id) is None
+
+
+def test_principal_cache_drops_least_recently_used() -> None:
+    cache = PrincipalCache(ttl=60, max_entries=2)
+    first, second, third = make_principal(), make_principal(), make_principal()
+    cache.put(first)
+    cache.put(second)
+    assert cache.get(first.id) is first
+    cache.put(third)
+    assert cache.get(second.id) is None
+    assert cache.get(first.id) is first
+    assert cache.get(third.id) is third
+
+
+def test_principal_cache_invalidate() -> None:
+    cache = PrincipalCache(ttl=60)
+    user = make_principal()
+    cache.put(user)
+    cache.invalidate(user.id)
+    assert cache.get(user.id) is None
+    cache.invalidate(user.id)
@@ -0,0 +1,179 @@
+"""
+Plans of the list and search queries on tables big enough for the planner to
+prefer an index whenever there's a usable one, so a missing index shows up as
+a sequential scan.
+
+Everything runs in a transaction that is rolled back, the seeded rows and
+their statistics never reach the other tests.
+"""
+
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session, col, select
+
+from app import search
+from app.core.db import engine, explain
+from app.models import Book, Item, OperatingDateTime, Payment, Restaurant, User
+
+USERS = 2_000
+RESTAURANTS = 20_000
+ROWS = 50_000
+PAGE = 101
+
+SEED = [
+    f"""
+    INSERT INTO "user" (id, email, cpf, is_active, is_superuser, full_name, hashed_password)
+    SELECT gen_random_uuid(), 'plan' || i || '@example.com', lpad(i::text, 11, '0'),
+           true, false, 'User ' || i, 'x'
+    FROM generate_series(1, {USERS}) AS i
+    """,
+    f"""
+    INSERT INTO restaurant (id, name, description, address, rating, book_price, owner_id)
+    SELECT gen_random_uuid(),
+           (CASE WHEN i % 500 = 0 THEN 'Pizzaria ' ELSE 'Restaurante ' END) || i,
+           'Comida caseira servida no almoço e no jantar, pratos do dia e sobremesas ' || i,
+           'Rua ' || i, 5.0, 1000, owners.ids[1 + i % {USERS}]
+    FROM generate_series(1, {RESTAURANTS}) AS i,
+         (SELECT array_agg(id) AS ids FROM "user" WHERE email LIKE 'plan%') AS owners
+    """,
+    """
+    INSERT INTO operatingdatetime (id, restaurant_id, day_of_week, open_time, close_time)
+    SELECT gen_random_uuid(), restaurant.id, day, '11:00', '23:00'
+    FROM restaurant,
+         unnest(ARRAY['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']) AS day
+    """,
+    f"""
+    INSERT INTO item (id, title, rating, restaurant_id, owner_id)
+    SELECT gen_random_uuid(), 'Item ' || i, 5.0, restaurants.ids[1 + i % {RESTAURANTS}],
+           owners.ids[1 + i % {USERS}]
+    FROM generate_series(1, {ROWS}) AS i,
+         (SELECT array_agg(id) AS ids FROM restaurant) AS restaurants,
+         (SELECT array_agg(id) AS ids FROM "user" WHERE email LIKE 'plan%') AS owners
+    """,
+    f"""
+    INSERT INTO book (id, restaurant_id, owner_id, people_quantity, reserved_for, active, created_at)
+    SELECT gen_random_uuid(), restaurants.ids[1 + i % {RESTAURANTS}],
+           owners.ids[1 + i % {USERS}], 2, now() + interval '1 day', false,
+           now() - i * interval '1 minute'
+    FROM generate_series(1, {ROWS}) AS i,
+         (SELECT array_agg(id) AS ids FROM restaurant) AS restaurants,
+         (SELECT array_agg(id) AS ids FROM "user" WHERE email LIKE 'plan%') AS owners
+    """,
+    """
+    INSERT INTO payment (id, book_id, owner_id, payment_type, value, status, token, created_at)
+    SELECT gen_random_uuid(), id, owner_id, 'pix', 1000, 'paid', md5(id::text), created_at
+    FROM book
+    """,
+    "ANALYZE",
+]
+
+QUERIES = [
+    "items",
+    "books",
+    "payments",
+    "restaurants",
+    "restaurant operating times",
+    "restaurant items",
+    "restaurant books",
+    "active charge",
+    "search fulltext",
+    "search fuzzy",
+    "users",
+]
+
+# only these are big enough here for a sequential scan to mean a missing index
+LARGE_TABLES = {"user", "restaurant", "operatingdatetime", "item", "book", "payment"}
+
+
+@pytest.fixture(scope="module")
+def seeded() -> Generator[tuple[Session, User], None, None]:
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        session = Session(bind=connection)
+        for statement in SEED:
+            session.execute(text(statement))
+        owner = session.exec(
+            select(User).where(User.email == "plan1@example.com")
+        ).one()
+        yield session, owner
+        session.close()
+        transaction.rollback()
+
+
+def seq_scans(plan: dict[str, Any]) -> set[str]:
+    found = set()
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in LARGE_TABLES:
+        found.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found |= seq_scans(child)
+    return found
+
+
+def statements(owner: User) -> dict[str, Any]:
+    """
+    The queries of the list and search endpoints, paginated as `paginate`
+    does it.
+    """
+    item = select(Item).where(Item.owner_id == owner.id)
+    book = select(Book).where(Book.owner_id == owner.id)
+    payment = select(Payment).where(Payment.owner_id == owner.id)
+    fulltext, fulltext_relevance = search.search_statement(  # type: ignore[misc]
+        "pizzaria", search.SearchMode.fulltext
+    )
+    fuzzy, fuzzy_relevance = search.search_statement(  # type: ignore[misc]
+        "pizaria", search.SearchMode.fuzzy
+    )
+    restaurant = select(Restaurant).where(Restaurant.owner_id == owner.id)
+    return {
+        "items": item.order_by(col(Item.title), col(Item.id)).limit(PAGE),
+        "books": book.order_by(col(Book.created_at), col(Book.id)).limit(PAGE),
+        "payments": payment.order_by(col(Payment.created_at), col(Payment.id)).limit(
+            PAGE
+        ),
+        "restaurants": select(Restaurant)
+        .order_by(col(Restaurant.name), col(Restaurant.id))
+        .limit(PAGE),
+        "restaurant operating times": select(OperatingDateTime).where(
+            col(OperatingDateTime.restaurant_id).in_(
+                restaurant.with_only_columns(col(Restaurant.id))
+            )
+        ),
+        "restaurant items": select(Item).where(
+            col(Item.restaurant_id).in_(
+                restaurant.with_only_columns(col(Restaurant.id))
+            )
+        ),
+        "restaurant books": select(Book)
+        .where(
+            col(Book.restaurant_id).in_(
+                restaurant.with_only_columns(col(Restaurant.id))
+            )
+        )
+        .order_by(col(Book.created_at), col(Book.id))
+        .limit(PAGE),
+        "active charge": select(Payment)
+        .where(
+            Payment.book_id
+            == book.with_only_columns(col(Book.id)).limit(1).scalar_subquery(),
+            Payment.owner_id == owner.id,
+            Payment.status == "pending",
+            col(Payment.token).is_not(None),
+        )
+        .order_by(col(Payment.created_at).desc())
+        .limit(1),
+        "search fulltext": fulltext.order_by(fulltext_relevance.desc()).limit(PAGE),
+        "search fuzzy": fuzzy.order_by(fuzzy_relevance.desc()).limit(PAGE),
+        "users": select(User).order_by(col(User.email), col(User.id)).limit(PAGE),
+    }
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_no_seq_scan(seeded: tuple[Session, User], name: str) -> None:
+    session, owner = seeded
+    if name == "search fuzzy":
+        search.prepare(session, search.SearchMode.fuzzy)
+    plan = explain(session, statements(owner)[name])
+    assert not seq_scans(plan["Plan"]), plan
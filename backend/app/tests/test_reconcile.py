@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session
+
+from app import payment, reconcile
+from app.models import Book
+from app.payment import ChargeCache, PixClient
+from app.tests.utils import fake_psp
+from app.tests.utils.payment import create_pending_payment
+
+
+@pytest.mark.anyio
+async def test_reconcile(
+    db: Session, pix_client: PixClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(payment, "_client", pix_client)
+    monkeypatch.setattr(reconcile, "charge_cache", ChargeCache(ttl=0))
+    paid = create_pending_payment(db, token=fake_psp.add_charge("CONCLUIDA"))
+    expired = create_pending_payment(
+        db,
+        token=fake_psp.add_charge(
+            created=datetime.now(timezone.utc) - timedelta(hours=2)
+        ),
+    )
+    active = create_pending_payment(db, token=fake_psp.add_charge())
+    unknown = create_pending_payment(db)
+    throttled = create_pending_payment(db, token=fake_psp.add_charge())
+    fake_psp.failures[str(throttled.token)] = 429
+
+    changed = await reconcile.reconcile(batch_size=2, concurrency=2)
+
+    assert changed["paid"] >= 1
+    assert changed["cancelled"] >= 1
+    for pending, status in (
+        (paid, "paid"),
+        (expired, "cancelled"),
+        (active, "pending"),
+        (unknown, "failed"),
+        # an error reading the charge tells nothing about it
+        (throttled, "pending"),
+    ):
+        db.refresh(pending)
+        assert pending.status == status
+    book = db.get(Book, paid.book_id)
+    assert book
+    db.refresh(book)
+    assert book.active
+    assert not await reconcile.reconcile()
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import create_engine
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.replicas import Replica, ReplicaSet
+
+
+def replica(name: str, uri: str) -> Replica:
+    return Replica(
+        name,
+        create_engine(uri, pool_pre_ping=True),
+        create_async_engine(uri, pool_pre_ping=True),
+    )
+
+
+def live_replica(name: str) -> Replica:
+    # the primary stands in for a replica
+    return replica(name, str(settings.SQLALCHEMY_DATABASE_URI))
+
+
+def dead_replica(name: str) -> Replica:
+    return replica(
+        name,
+        f"postgresql+psycopg://{settings.POSTGRES_USER}@127.0.0.1:1/db?connect_timeout=1",
+    )
+
+
+def test_replicas_round_robin() -> None:
+    first, second = live_replica("first"), live_replica("second")
+    replicas = ReplicaSet([first, second])
+    binds = []
+    for _ in range(4):
+        with replicas.session() as session:
+            binds.append(session.get_bind())
+    assert binds == [first.engine, second.engine] * 2
+
+
+def test_replicas_skip_unreachable() -> None:
+    dead, live = dead_replica("dead"), live_replica("live")
+    replicas = ReplicaSet([dead, live])
+    for _ in range(3):
+        with replicas.session() as session:
+            assert session.get_bind() is live.engine
+    assert not dead.available
+
+
+def test_replicas_fall_back_to_primary(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "POSTGRES_REPLICA_MAX_LAG_SECONDS", -1.0)
+    lagging = live_replica("lagging")
+    replicas = ReplicaSet([lagging])
+    with replicas.session() as session:
+        assert session.get_bind() is engine
+    assert not lagging.available
+    with ReplicaSet([]).session() as session:
+        assert session.get_bind() is engine
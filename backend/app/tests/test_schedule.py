@@ -0,0 +1,39 @@
+from datetime import datetime, time
+
+from sqlmodel import Session
+
+from app.models import OperatingDateTime, WeekEnum
+from app.schedule import minute_of_week, open_restaurant_ids
+from app.tests.utils.restaurant import create_random_restaurant
+
+# 2024-11-18 is a monday
+MONDAY = datetime(2024, 11, 18)
+
+
+def test_minute_of_week() -> None:
+    assert minute_of_week(MONDAY) == 0
+    assert minute_of_week(MONDAY.replace(day=24, hour=23, minute=59)) == 7 * 1440 - 1
+
+
+def test_open_restaurant_ids(db: Session) -> None:
+    restaurant = create_random_restaurant(db)
+
+    def is_open(at: datetime) -> bool:
+        return restaurant.id in db.scalars(open_restaurant_ids(at)).all()
+
+    assert not is_open(MONDAY)
+
+    # sunday 18:00 to monday 02:00
+    db.add(
+        OperatingDateTime(
+            restaurant_id=restaurant.id,
+            day_of_week=WeekEnum.Sunday,
+            open_time=time(18, 0),
+            close_time=time(2, 0),
+        )
+    )
+    db.commit()
+    assert is_open(MONDAY.replace(hour=1))
+    assert not is_open(MONDAY.replace(hour=2))
+    assert is_open(MONDAY.replace(day=24, hour=20))
+    assert not is_open(MONDAY.replace(day=24, hour=17))
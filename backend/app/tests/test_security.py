@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.deps import _token_user_id
+from app.core import security
+from app.core.security import (
+    PasswordHasher,
+    PasswordHasherBusy,
+    TokenCache,
+    create_access_token,
+    get_password_hash,
+    verify_password,
+)
+
+
+def test_token_cache() -> None:
+    cache = TokenCache()
+    user_id = uuid.uuid4()
+    assert cache.get("token") is None
+    cache.put("token", user_id, time.time() + 60)
+    assert cache.get("token") == user_id
+    assert cache.get("other") is None
+
+
+def test_token_cache_expires() -> None:
+    cache = TokenCache()
+    cache.put("token", uuid.uuid4(), time.time() - 1)
+    assert cache.get("token") is None
+
+
+def test_token_cache_drops_least_recently_used() -> None:
+    cache = TokenCache(max_entries=2)
+    expires_at = time.time() + 60
+    for token in ("first", "second"):
+        cache.put(token, uuid.uuid4(), expires_at)
+    assert cache.get("first")
+    cache.put("third", uuid.uuid4(), expires_at)
+    assert cache.get("second") is None
+    assert cache.get("first")
+    assert cache.get("third")
+
+
+def test_token_user_id_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(security, "token_cache", TokenCache())
+    user_id = uuid.uuid4()
+    token = create_access_token(user_id, timedelta(minutes=5))
+    assert _token_user_id(token) == user_id
+    assert security.token_cache.get(token) == user_id
+    assert _token_user_id(token) == user_id
+
+
+def test_token_user_id_invalid(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(security, "token_cache", TokenCache())
+    token = create_access_token(uuid.uuid4(), timedelta(minutes=5))
+    with pytest.raises(HTTPException) as e:
+        _token_user_id(token[:-2])
+    assert e.value.status_code == 403
+    expired = create_access_token(uuid.uuid4(), timedelta(minutes=-5))
+    with pytest.raises(HTTPException):
+        _token_user_id(expired)
+    assert not security.token_cache._entries
+
+
+def test_password_hash() -> None:
+    hashed_password = get_password_hash("changethis")
+    assert verify_password("changethis", hashed_password)
+    assert not verify_password("changethat", hashed_password)
+
+
+def test_password_hasher_busy() -> None:
+    hasher = PasswordHasher(workers=1, max_queued=1)
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as callers:
+        # one running, one queued
+        running = [callers.submit(hasher.run, release.wait) for _ in range(2)]
+        while hasher._slots._value:
+            time.sleep(0.001)
+        with pytest.raises(PasswordHasherBusy):
+            hasher.run(time.time)
+        release.set()
+        assert all(call.result() for call in running)
+    assert hasher.run(len, "free again") == 10
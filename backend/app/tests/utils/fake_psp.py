@@ -0,0 +1,132 @@
+"""
+Fake EfiPay PIX API, enough of it to create and read immediate charges.
+
+Tests mount it in-process through `httpx.ASGITransport`; it can also run as a
+local server to point EFIPAY_BASE_URL at:
+
+    python -m app.tests.utils.fake_psp --port 8001
+"""
+
+import argparse
+import secrets
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+from fastapi import FastAPI, Header, HTTPException, Request
+
+app = FastAPI(title="Fake EfiPay")
+
+# txid -> charge, as returned by GET /v2/cob/{txid}
+charges: dict[str, dict[str, Any]] = {}
+tokens: set[str] = set()
+# number of requests per path, to check what reached the PSP
+calls: dict[str, int] = {}
+# txid -> status code the PSP answers with instead of the charge
+failures: dict[str, int] = {}
+
+
+def reset() -> None:
+    charges.clear()
+    tokens.clear()
+    calls.clear()
+    failures.clear()
+
+
+def set_status(txid: str, status: str) -> None:
+    charges[txid]["status"] = status
+
+
+def add_charge(
+    status: str = "ATIVA", created: datetime | None = None, expiration: int = 3600
+) -> str:
+    """
+    Register a charge directly, returns its txid.
+    """
+    txid = uuid.uuid4().hex
+    charges[txid] = {
+        "txid": txid,
+        "calendario": {
+            "criacao": (created or datetime.now(timezone.utc)).isoformat(),
+            "expiracao": expiration,
+        },
+        "status": status,
+        "valor": {"original": "10.00"},
+    }
+    return txid
+
+
+def _count(request: Request) -> None:
+    key = f"{request.method} {request.url.path}"
+    calls[key] = calls.get(key, 0) + 1
+
+
+def _authorize(authorization: str | None) -> None:
+    if not authorization or authorization.removeprefix("Bearer ") not in tokens:
+        raise HTTPException(status_code=401, detail="unauthorized")
+
+
+@app.post("/oauth/token")
+def oauth_token(request: Request) -> dict[str, Any]:
+    _count(request)
+    token = secrets.token_urlsafe(16)
+    tokens.add(token)
+    return {
+        "access_token": token,
+        "token_type": "Bearer",
+        "expires_in": 3600,
+        "scope": "cob.read cob.write",
+    }
+
+
+@app.post("/v2/cob", status_code=201)
+def create_charge(
+    request: Request, body: dict[str, Any], authorization: str | None = Header(None)
+) -> dict[str, Any]:
+    _count(request)
+    _authorize(authorization)
+    txid = uuid.uuid4().hex
+    charges[txid] = {
+        "txid": txid,
+        "calendario": {
+            "criacao": datetime.now(timezone.utc).isoformat(),
+            "expiracao": body["calendario"]["expiracao"],
+        },
+        "revisao": 0,
+        "loc": {
+            "id": len(charges) + 1,
+            "location": f"fake.psp/v2/{txid}",
+            "tipoCob": "cob",
+        },
+        "location": f"fake.psp/v2/{txid}",
+        "status": "ATIVA",
+        "devedor": body.get("devedor"),
+        "valor": body["valor"],
+        "chave": body["chave"],
+        "solicitacaoPagador": body.get("solicitacaoPagador"),
+        "pixCopiaECola": f"00020101021226830014BR.GOV.BCB.PIX{txid}",
+    }
+    return charges[txid]
+
+
+@app.get("/v2/cob/{txid}")
+def detail_charge(
+    request: Request, txid: str, authorization: str | None = Header(None)
+) -> dict[str, Any]:
+    _count(request)
+    _authorize(authorization)
+    if txid in failures:
+        raise HTTPException(status_code=failures[txid], detail="erro")
+    if txid not in charges:
+        raise HTTPException(status_code=404, detail="cobranca nao encontrada")
+    return charges[txid]
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -2,15 +2,15 @@ from sqlmodel import Session
 
 from app import crud
 from app.models import Item, ItemCreate
-from app.tests.utils.user import create_random_user
+from app.tests.utils.restaurant import create_random_restaurant
 from app.tests.utils.utils import random_lower_string
 
 
 def create_random_item(db: Session) -> Item:
-    user = create_random_user(db)
-    owner_id = user.id
-    assert owner_id is not None
+    restaurant = create_random_restaurant(db)
     title = random_lower_string()
     description = random_lower_string()
-    item_in = ItemCreate(title=title, description=description)
-    return crud.create_item(session=db, item_in=item_in, owner_id=owner_id)
+    item_in = ItemCreate(
+        restaurant_id=restaurant.id, title=title, description=description
+    )
+    return crud.create_item(session=db, item_in=item_in, owner_id=restaurant.owner_id)
@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app.models import Book, Payment
+from app.tests.utils.restaurant import create_random_restaurant
+
+
+def create_random_book(db: Session, owner_id: uuid.UUID | None = None) -> Book:
+    restaurant = create_random_restaurant(db, book_price=1000)
+    book = Book(
+        restaurant_id=restaurant.id,
+        owner_id=owner_id or restaurant.owner_id,
+        people_quantity=2,
+        reserved_for=datetime.utcnow() + timedelta(days=1),
+    )
+    db.add(book)
+    db.commit()
+    db.refresh(book)
+    return book
+
+
+def create_pending_payment(db: Session, token: str | None = None) -> Payment:
+    book = create_random_book(db)
+    payment = Payment(
+        book_id=book.id,
+        owner_id=book.owner_id,
+        value=1000,
+        token=token or uuid.uuid4().hex,
+    )
+    db.add(payment)
+    db.commit()
+    db.refresh(payment)
+    return payment
@@ -0,0 +1,109 @@
+"""
+Replay PIX notification batches against the webhook, to load test it.
+
+Notifications are built for the pending payments in the database (or random
+txids with --random) and a share of them is sent again, as the PSP does when
+it retries, to exercise the idempotency of the endpoint:
+
+    python -m app.tests.utils.pix_webhook --url http://localhost:8000/api/v1/payments/webhook \\
+        --batch-size 100 --concurrency 8 --duplicates 0.2
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.models import Payment
+
+
+def pending_charges(limit: int) -> list[tuple[str, int]]:
+    with Session(engine) as session:
+        statement = (
+            select(Payment.token, Payment.value)
+            .where(Payment.status == "pending", Payment.token != None)  # noqa: E711
+            .limit(limit)
+        )
+        return [(str(token), value) for token, value in session.exec(statement)]
+
+
+def notification(txid: str, value: int) -> dict[str, Any]:
+    return {
+        "endToEndId": f"E{uuid.uuid4().hex}",
+        "txid": txid,
+        "chave": "simulator",
+        "valor": f"{value / 100:.2f}",
+        "horario": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def build_batches(
+    charges: list[tuple[str, int]], batch_size: int, duplicates: float
+) -> list[list[dict[str, Any]]]:
+    notifications = [notification(txid, value) for txid, value in charges]
+    notifications += random.sample(notifications, int(len(notifications) * duplicates))
+    random.shuffle(notifications)
+    return [
+        notifications[i : i + batch_size]
+        for i in range(0, len(notifications), batch_size)
+    ]
+
+
+async def replay(
+    url: str, batches: list[list[dict[str, Any]]], concurrency: int
+) -> list[float]:
+    slots = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def send(client: httpx.AsyncClient, batch: list[dict[str, Any]]) -> None:
+        async with slots:
+            start = time.perf_counter()
+            response = await client.post(url, json={"pix": batch})
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        await asyncio.gather(*(send(client, batch) for batch in batches))
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--payments", type=int, default=10_000)
+    parser.add_argument("--random", action="store_true", help="don't read the database")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duplicates", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.random:
+        charges = [(uuid.uuid4().hex, 1000) for _ in range(args.payments)]
+    else:
+        charges = pending_charges(args.payments)
+    batches = build_batches(charges, args.batch_size, args.duplicates)
+    sent = sum(len(batch) for batch in batches)
+
+    start = time.perf_counter()
+    latencies = asyncio.run(replay(args.url, batches, args.concurrency))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{sent} notifications in {len(batches)} batches, {elapsed:.2f}s")
+    print(f"{sent / elapsed:.0f} notifications/s")
+    print(
+        f"batch latency p50 {statistics.median(latencies) * 1000:.1f}ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
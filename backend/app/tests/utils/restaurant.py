@@ -0,0 +1,21 @@
+from sqlmodel import Session
+
+from app.models import Restaurant
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_restaurant(db: Session, **fields: object) -> Restaurant:
+    user = create_random_user(db)
+    data = {
+        "name": random_lower_string(),
+        "description": random_lower_string(),
+        "address": random_lower_string(),
+        **fields,
+    }
+    # not model_validate: it would read the `items` relationship off the dict
+    restaurant = Restaurant(**data, owner_id=user.id)
+    db.add(restaurant)
+    db.commit()
+    db.refresh(restaurant)
+    return restaurant
@@ -0,0 +1,49 @@
+"""
+Time how long authenticating a bearer token takes in the request path,
+verifying it every time and with the verified token cache:
+
+    python -m app.tests.utils.token_benchmark --iterations 100000
+"""
+
+import argparse
+import time
+import uuid
+from collections.abc import Callable
+from datetime import timedelta
+
+from app.api.deps import _token_user_id
+from app.core import security
+
+
+def per_call(function: Callable[[], object], iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        function()
+    return (time.process_time() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the token decoding")
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    token = security.create_access_token(uuid.uuid4(), timedelta(days=8))
+
+    def uncached() -> None:
+        security.token_cache.clear()
+        _token_user_id(token)
+
+    def cached() -> None:
+        _token_user_id(token)
+
+    # the clear alone, taken out of the uncached time
+    baseline = per_call(security.token_cache.clear, args.iterations)
+    verified = per_call(uncached, args.iterations) - baseline
+    hit = per_call(cached, args.iterations)
+    print(f"verified: {verified * 1e6:8.2f} µs CPU per request")
+    print(f"cached:   {hit * 1e6:8.2f} µs CPU per request")
+    print(f"saved:    {(verified - hit) * 1e6:8.2f} µs ({verified / hit:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
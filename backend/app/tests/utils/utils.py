@@ -14,6 +14,16 @@ def random_email() -> str:
     return f"{random_lower_string()}@{random_lower_string()}.com"
 
 
+def random_cpf() -> str:
+    digits = random.choices(range(10), k=9)
+    for length in (9, 10):
+        total = sum(
+            d * w for d, w in zip(digits, range(length + 1, 1, -1), strict=True)
+        )
+        digits.append(total * 10 % 11 % 10)
+    return "".join(map(str, digits))
+
+
 def get_superuser_token_headers(client: TestClient) -> dict[str, str]:
     login_data = {
         "username": settings.FIRST_SUPERUSER,
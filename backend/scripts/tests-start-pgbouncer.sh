@@ -0,0 +1,18 @@
+#! /usr/bin/env bash
+# Run the test suite through PgBouncer in transaction pooling mode, e.g.
+#
+#   docker compose --profile pgbouncer up -d db pgbouncer
+#   POSTGRES_SERVER=localhost bash scripts/tests-start-pgbouncer.sh
+set -e
+set -x
+
+# migrations and initial data straight to the database
+alembic upgrade head
+python app/initial_data.py
+
+# then the app through PgBouncer, whose small server pool makes consecutive
+# transactions of a session land on different server connections
+export DB_POOL_MODE=pgbouncer
+export POSTGRES_SERVER="${PGBOUNCER_SERVER:-${POSTGRES_SERVER:-localhost}}"
+export POSTGRES_PORT="${PGBOUNCER_PORT:-6432}"
+bash scripts/tests-start.sh "$@"